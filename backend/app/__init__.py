@@ -8,13 +8,22 @@ including services for donor scheduling, gamification, emergency handling,
 and data import.
 """
 
-# Optional: expose main services at package level for convenience
-from .services.data_import_service import DataImportService
-from .services.emergency_service import DonorScheduler
-from .services.gamification_service import GamificationService
+# Optional: expose main services at package level for convenience.
+# Resolved on first access so importing the package (e.g. app.main) stays cheap.
+_EXPORTS = {
+    "DataImportService": ".services.data_import_service",
+    "DonorScheduler": ".services.emergency_service",
+    "GamificationService": ".services.gamification_service",
+}
 
-__all__ = [
-    "DataImportService",
-    "DonorScheduler",
-    "GamificationService",
-]
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        from importlib import import_module
+
+        value = getattr(import_module(_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 from ...database import get_db
 from ...services.blood_matching_service import BloodMatchingService
+from ...services.match_cache import match_cache
 from ...models.user import User
 
 router = APIRouter(prefix="/blood-matching", tags=["Blood Matching"])
@@ -31,6 +32,17 @@ class MatchRequest(BaseModel):
     emergency: bool = False
     limit: int = 10
 
+class BatchMatchRequest(BaseModel):
+    patient_ids: List[str] = Field(..., min_length=1, max_length=1000)
+    emergency: bool = False
+    limit: int = 10
+    # When set, no donor is proposed to more than this many patients of the batch
+    max_patients_per_donor: Optional[int] = Field(None, ge=1)
+
+class PatientMatches(BaseModel):
+    patient_id: str
+    matches: List[DonorMatch]
+
 class BridgeRequest(BaseModel):
     patient_id: str
     donor_id: str
@@ -38,41 +50,74 @@ class BridgeRequest(BaseModel):
 # ----------------------
 # Endpoints
 # ----------------------
+# Routes using the (synchronous) Session are plain `def`: FastAPI runs them on
+# its worker thread pool, so a query never blocks the event loop.
 
 @router.post("/find-donors", response_model=List[DonorMatch])
-async def find_matching_donors(request: MatchRequest, db: Session = Depends(get_db)):
+def find_matching_donors(request: MatchRequest, db: Session = Depends(get_db)):
     """
     Find best matching donors for a patient using AI-powered algorithm.
+    Results are cached until a listed donor or the patient changes (see match_cache).
     """
     try:
+        key = (request.patient_id, request.emergency, request.limit)
+        cached = match_cache.get(key)
+        if cached is not None:
+            return cached
+        generation = match_cache.generation
         matches = BloodMatchingService.find_matching_donors(
             db=db,
             patient_id=request.patient_id,
             limit=request.limit,
             emergency=request.emergency
         )
-        result = []
-        for match in matches:
-            donor = match["donor"]
-            result.append(DonorMatch(
-                donor_id=donor.user_id,
-                blood_group=match.get("blood_group", ""),
-                distance_km=match.get("distance_km", 0.0),
-                score=match.get("score", 0.0),
-                eligibility_status=match.get("eligibility_status"),
-                donations_count=match.get("donations_count", 0),
-                last_donation_date=match.get("last_donation_date"),
-                next_eligible_date=match.get("next_eligible_date"),
-                latitude=getattr(donor, "latitude", None),
-                longitude=getattr(donor, "longitude", None)
-            ))
+        result = [_donor_match(match) for match in matches]
+        match_cache.put(key, result, [m.donor_id for m in result], generation=generation)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/find-donors/batch", response_model=List[PatientMatches])
+def find_matching_donors_batch(request: BatchMatchRequest, db: Session = Depends(get_db)):
+    """
+    Find best matching donors for many patients in one pass (e.g. the morning run
+    for all upcoming transfusions). Unknown patients get an empty match list.
+    """
+    try:
+        results = BloodMatchingService.find_matching_donors_batch(
+            db=db,
+            patient_ids=request.patient_ids,
+            limit=request.limit,
+            emergency=request.emergency,
+            max_patients_per_donor=request.max_patients_per_donor
+        )
+        return [
+            PatientMatches(patient_id=patient_id, matches=[_donor_match(match) for match in matches])
+            for patient_id, matches in results.items()
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _donor_match(match: dict) -> DonorMatch:
+    donor = match["donor"]
+    return DonorMatch(
+        donor_id=donor.user_id,
+        blood_group=match.get("blood_group", ""),
+        distance_km=match.get("distance_km", 0.0),
+        score=match.get("score", 0.0),
+        eligibility_status=match.get("eligibility_status"),
+        donations_count=match.get("donations_count", 0),
+        last_donation_date=match.get("last_donation_date"),
+        next_eligible_date=match.get("next_eligible_date"),
+        latitude=getattr(donor, "latitude", None),
+        longitude=getattr(donor, "longitude", None)
+    )
+
+
 @router.post("/create-bridge")
-async def create_bridge_relationship(request: BridgeRequest, db: Session = Depends(get_db)):
+def create_bridge_relationship(request: BridgeRequest, db: Session = Depends(get_db)):
     """
     Create a bridge relationship between a patient and a donor.
     """
@@ -92,7 +137,7 @@ async def create_bridge_relationship(request: BridgeRequest, db: Session = Depen
 
 
 @router.get("/patient-bridges/{patient_id}")
-async def get_patient_bridges(patient_id: str, active_only: bool = Query(True), db: Session = Depends(get_db)):
+def get_patient_bridges(patient_id: str, active_only: bool = Query(True), db: Session = Depends(get_db)):
     """
     Get all bridge relationships for a patient.
     """
@@ -116,7 +161,7 @@ async def get_patient_bridges(patient_id: str, active_only: bool = Query(True),
 
 
 @router.get("/donor-bridges/{donor_id}")
-async def get_donor_bridges(donor_id: str, active_only: bool = Query(True), db: Session = Depends(get_db)):
+def get_donor_bridges(donor_id: str, active_only: bool = Query(True), db: Session = Depends(get_db)):
     """
     Get all bridge relationships for a donor.
     """
@@ -139,6 +184,14 @@ async def get_donor_bridges(donor_id: str, active_only: bool = Query(True), db:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/cache-stats")
+async def get_match_cache_stats():
+    """
+    Hit/miss counters of the /find-donors result cache.
+    """
+    return match_cache.stats()
+
+
 @router.get("/compatibility/{blood_group}")
 async def get_compatible_blood_groups(blood_group: str):
     """
@@ -1,19 +1,67 @@
-from fastapi import APIRouter, WebSocket
-from typing import List
+from typing import Optional
+
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+
+from ...config import settings
+from ...services.chat_hub import DEFAULT_ROOM, get_chat_hub
 
 router = APIRouter()
 
-active_connections: List[WebSocket] = []
 
-@router.websocket("/ws")
-async def websocket_endpoint(ws: WebSocket):
+async def _serve(ws: WebSocket, room: str, since: Optional[int]):
+    hub = await get_chat_hub()
     await ws.accept()
-    active_connections.append(ws)
+    subscriber = await hub.join(room, ws, since=since)
     try:
         while True:
             data = await ws.receive_text()
-            for conn in active_connections:
-                if conn != ws:
-                    await conn.send_text(f"Message: {data}")
-    except:
-        active_connections.remove(ws)
+            await hub.publish(room, data, sender=subscriber)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await hub.leave(subscriber)
+
+
+@router.websocket("/ws")
+async def websocket_endpoint(ws: WebSocket, since: Optional[int] = None):
+    await _serve(ws, DEFAULT_ROOM, since)
+
+
+@router.websocket("/ws/{room}")
+async def room_websocket_endpoint(ws: WebSocket, room: str, since: Optional[int] = None):
+    """
+    One room per bridge, forum topic, etc.; messages reach every other member
+    of the room. Reconnecting clients pass `since` (the last seq they saw):
+    they receive JSON frames ({"room", "seq", "text", "sent_at"}), starting
+    with the messages they missed.
+    """
+    await _serve(ws, room, since)
+
+
+@router.get("/history/{room}")
+async def chat_history(
+    room: str,
+    since: Optional[int] = Query(None, description="Messages after this seq, oldest first"),
+    before: Optional[int] = Query(None, description="Messages before this seq (scrolling back)"),
+    limit: int = Query(50, ge=1, le=settings.CHAT_HISTORY_MAX_PAGE),
+):
+    """
+    One page of a room's history in seq order. Without `since` or `before`
+    the latest messages are returned. Continue forward with since=next_since.
+    """
+    hub = await get_chat_hub()
+    if hub.log is None:
+        return {"room": room, "messages": [], "next_since": since, "has_more": False}
+    messages = await hub.log.history(room, since=since, before=before, limit=limit)
+    return {
+        "room": room,
+        "messages": messages,
+        "next_since": messages[-1]["seq"] if messages else since,
+        "has_more": len(messages) == limit,
+    }
+
+
+@router.get("/stats")
+async def chat_stats():
+    hub = await get_chat_hub()
+    return hub.stats()
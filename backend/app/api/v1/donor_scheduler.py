@@ -1,14 +1,23 @@
 # backend/app/api/v1/donor_scheduler.py
-from fastapi import APIRouter, Query
-from datetime import datetime
-from ...services.donor_scheduler_service import DonorScheduler
+from fastapi import APIRouter, Depends, Query
+from datetime import date, datetime
+from typing import Optional
+from functools import lru_cache
 
 router = APIRouter()
-scheduler = DonorScheduler()
+
+
+@lru_cache(maxsize=None)
+def get_scheduler():
+    """Process-wide DonorScheduler, built on the first scheduler request"""
+    from ...services.emergency_service import DonorScheduler
+
+    return DonorScheduler()
 
 @router.get("/emergency-donors")
 def get_emergency_donors(
-    lat: float = Query(...), lon: float = Query(...), blood_group: str = Query(...), top_n: int = 10
+    lat: float = Query(...), lon: float = Query(...), blood_group: str = Query(...), top_n: int = 10,
+    scheduler=Depends(get_scheduler)
 ):
     return scheduler.emergency_donors(lat, lon, blood_group, top_n)
 
@@ -19,9 +28,34 @@ def get_scheduled_donors(
     lon: float = Query(...),
     blood_group: str = Query(...),
     transfusion_date: str = Query(...),
-    units_needed: int = Query(1)
+    units_needed: int = Query(1),
+    scheduler=Depends(get_scheduler)
 ):
     transfusion_dt = datetime.fromisoformat(transfusion_date)
     return scheduler.schedule_regular_transfusion(
         patient_id, lat, lon, blood_group, transfusion_dt, units_needed
     )
+
+@router.post("/plan")
+def plan_transfusions(
+    start: Optional[date] = Query(None),
+    horizon_days: Optional[int] = Query(None, ge=1, le=90),
+    scheduler=Depends(get_scheduler)
+):
+    """Assign donors to all patients' transfusions due within the planning horizon"""
+    return scheduler.plan_transfusions(start, horizon_days)
+
+@router.get("/bookings")
+def get_bookings(start: date = Query(...), end: date = Query(...), scheduler=Depends(get_scheduler)):
+    """Donor bookings with start <= scheduled date < end"""
+    return scheduler.ledger.booked_in_range(start, end)
+
+@router.get("/bookings/{donor_id}/free")
+def is_donor_free(donor_id: str, day: date = Query(...), scheduler=Depends(get_scheduler)):
+    return {"donor_id": donor_id, "day": day.isoformat(), "free": scheduler.ledger.is_free(donor_id, day)}
+
+@router.delete("/bookings")
+def expire_bookings(before: Optional[date] = Query(None), scheduler=Depends(get_scheduler)):
+    """Drop bookings scheduled before the given day (default: today)"""
+    before = before or date.today()
+    return {"before": before.isoformat(), "removed": scheduler.ledger.expire_before(before)}
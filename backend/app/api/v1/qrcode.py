@@ -1,14 +1,14 @@
-from fastapi import APIRouter
-import qrcode
-import io
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Header
+from typing import Optional
+
+from ...services.qr_cache import qr_cache, etag_for, etag_matches, not_modified, png_response
 
 router = APIRouter()
 
 @router.get("/{data}")
-async def generate_qr(data: str):
-    qr = qrcode.make(data)
-    buf = io.BytesIO()
-    qr.save(buf, format="PNG")
-    buf.seek(0)
-    return StreamingResponse(buf, media_type="image/png")
+async def generate_qr(data: str, if_none_match: Optional[str] = Header(None)):
+    key = qr_cache.key(data)
+    if etag_matches(etag_for(key), if_none_match):
+        return not_modified(etag_for(key))
+    # Cache misses render in the thread pool, off the event loop
+    return png_response(await qr_cache.render_async(data))
@@ -1,6 +1,5 @@
-import pandas as pd
 from .config import settings
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 # -----------------------------
@@ -8,7 +7,25 @@ from sqlalchemy.orm import declarative_base, sessionmaker
 # -----------------------------
 DATABASE_URL = "sqlite:///./test.db"  # or your actual DB URL
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+)
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets the pooled readers run while a writer commits; wait instead of failing on a lock
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", _sqlite_pragmas)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -22,38 +39,71 @@ class CSVDatabase:
 
     def __init__(self, csv_path: str = settings.CSV_FILE_PATH):
         self.csv_path = csv_path
-        self._data = None
-        self.load_data()
+        # FrameIndex over the attached frame; replaced as a whole on reload
+        self._index = None
+        self._source = None
+        self._unsubscribe = None
+
+    @property
+    def data(self):
+        """The donor frame, attached on first use."""
+        return self.index.frame
+
+    @property
+    def index(self):
+        """Secondary indexes of the attached frame, built at load time."""
+        if self._index is None:
+            self.load_data()
+        return self._index
 
     def load_data(self):
-        """Load CSV into memory."""
+        """Attach the shared, typed donor frame for this CSV and index it."""
+        # Imported here: the services import the models, which import this module
+        from .services.donor_store import get_snapshot, subscribe
+        from .services.frame_index import FrameIndex
+
         try:
-            self._data = pd.read_csv(self.csv_path)
+            snapshot = get_snapshot(self.csv_path)
+            self._index, self._source = FrameIndex(snapshot.frame), snapshot.path
+            if self._unsubscribe is None:
+                self._unsubscribe = subscribe(self._on_reload)
         except FileNotFoundError:
             raise FileNotFoundError(f"CSV file not found at {self.csv_path}")
         except Exception as e:
             raise RuntimeError(f"Error loading CSV: {e}")
 
+    def _on_reload(self, snapshot):
+        """Follow hot reloads of this CSV; the new index is built before it is swapped in"""
+        from .services.frame_index import FrameIndex
+
+        if snapshot.path == self._source:
+            self._index = FrameIndex(snapshot.frame)
+
     def get_all(self):
         """Return the whole dataset as a pandas DataFrame."""
-        return self._data
+        return self.data
 
     def query(self, **filters):
         """
-        Filter rows based on column=value pairs.
-        Example: db.query(Sex="M", Outcome="Positive")
+        Filter rows based on column=value pairs, answered from the indexes where possible.
+        Suffixes select other operators: __in, __gt, __gte, __lt, __lte.
+        Example: db.query(blood_group="O+", role__in=["Bridge Donor"], next_eligible_date__lte="2025-09-01")
         """
-        df = self._data
-        for key, value in filters.items():
-            if key in df.columns:
-                df = df[df[key] == value]
-        return df
+        index = self.index
+        positions, _ = index.lookup(**filters)
+        return index.frame.iloc[positions]
+
+    def explain(self, **filters):
+        """Which index (or scan) served each filter of query(**filters), and the rows left after it."""
+        positions, steps = self.index.lookup(**filters)
+        return {"filters": steps, "rows": int(len(positions))}
 
     def get_unique_values(self, column: str):
         """Get unique values from a column."""
-        if column not in self._data.columns:
+        index = self.index
+        if column not in index.frame.columns:
             raise ValueError(f"Column '{column}' does not exist in CSV.")
-        return self._data[column].unique().tolist()
+        return list(index.unique_values(column))
 
 
 # -----------------------------
@@ -2,6 +2,8 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 from .config import settings
@@ -12,6 +14,7 @@ from .api.v1 import (
     patients,
     emergency,
     chat,
+    donor_scheduler,
 )
 
 # -------------------------------------------------
@@ -20,6 +23,64 @@ from .api.v1 import (
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# -------------------------------------------------
+# Startup & Readiness
+# -------------------------------------------------
+# Heavy resources are initialized after the server starts accepting
+# connections; /health answers immediately, /ready once they are loaded.
+readiness = {"database": False, "donor_store": False}
+startup_errors = {}
+
+
+def init_database():
+    """Create missing tables (schema check)"""
+    Base.metadata.create_all(bind=engine)
+
+
+def warm_donor_store():
+    """Parse the shared donor frame so the first data request doesn't pay for it"""
+    from .services.donor_store import get_donor_frame
+
+    get_donor_frame()
+
+
+async def _initialize(name: str, func):
+    try:
+        await asyncio.to_thread(func)
+        readiness[name] = True
+        logger.info(f"Startup: {name} ready")
+    except Exception as e:
+        startup_errors[name] = str(e)
+        logger.error(f"Startup: {name} failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    import anyio.to_thread
+    from .services.donor_store import DonorStoreWatcher
+
+    # Sync (def) routes and dependencies, i.e. all database access, run on this pool
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_WORKERS
+
+    tasks = [
+        asyncio.create_task(_initialize("database", init_database)),
+        asyncio.create_task(_initialize("donor_store", warm_donor_store)),
+    ]
+    # Picks up CSV changes without a restart; only reloads frames already loaded
+    watcher = DonorStoreWatcher(settings.DONOR_RELOAD_INTERVAL_SECONDS)
+    watcher.start()
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.to_thread(watcher.stop)
+    # Write out point awards still waiting in the write-behind queue
+    from .services.point_award_queue import shutdown_point_award_queue
+    await asyncio.to_thread(shutdown_point_award_queue)
+    from .services.chat_hub import shutdown_chat_hub
+    await shutdown_chat_hub()
+    from .services.qr_bulk import shutdown_qr_pool
+    await asyncio.to_thread(shutdown_qr_pool)
+
 # -------------------------------------------------
 # FastAPI App Instance
 # -------------------------------------------------
@@ -27,6 +88,7 @@ app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     description="AI-powered Thalassemia Care Platform",
+    lifespan=lifespan,
 )
 
 # -------------------------------------------------
@@ -40,11 +102,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# -------------------------------------------------
-# Database Initialization
-# -------------------------------------------------
-Base.metadata.create_all(bind=engine)
-
 # -------------------------------------------------
 # Routers
 # -------------------------------------------------
@@ -70,6 +127,14 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    ready = all(readiness.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "starting", "components": readiness, "errors": startup_errors},
+    )
+
 # -------------------------------------------------
 # Exception Handlers
 # -------------------------------------------------
@@ -0,0 +1,9 @@
+# backend/app/models/__init__.py
+# Import every model so relationship() targets resolve whichever model is used first
+from .user import User, UserRole, BloodGroup
+from .bridge_relationship import BridgeRelationship
+from .donation_history import DonationHistory
+from .emergency_profile import EmergencyProfile
+from .gamification import GamificationProfile, PointAwardJournal, PointAwardSeqBlock
+from .donor_booking import DonorBooking
+from .chat_message import ChatMessage
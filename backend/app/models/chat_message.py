@@ -0,0 +1,20 @@
+# backend/app/models/chat_message.py
+from sqlalchemy import Column, String, Integer, Text, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from ..database import Base
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+    __table_args__ = (
+        # One message per (channel, seq); also serves history pages and catch-up ("seq > N")
+        UniqueConstraint("channel", "seq", name="uq_chat_message_channel_seq"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    channel = Column(String, nullable=False)
+    seq = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    sender = Column(String, nullable=True)
+
+    sent_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,21 @@
+# backend/app/models/donor_booking.py
+from sqlalchemy import Column, String, Integer, Date, DateTime, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from ..database import Base
+
+class DonorBooking(Base):
+    __tablename__ = "donor_bookings"
+    __table_args__ = (
+        # One booking per donor per day; also the donor -> date index for "is donor free on X"
+        UniqueConstraint("donor_id", "scheduled_date", name="uq_donor_booking_day"),
+        # "Who is booked in range" and expiry of past bookings
+        Index("ix_donor_bookings_scheduled_date", "scheduled_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    donor_id = Column(String, nullable=False)
+    patient_id = Column(String, nullable=True)
+    scheduled_date = Column(Date, nullable=False)
+    transfusion_date = Column(Date, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,63 +1,118 @@
-# backend/app/services/leaderboard_service.py
-from sqlalchemy.orm import Session
-from ..models.gamification import GamificationProfile
-
-class LeaderboardService:
-    @staticmethod
-    def calculate_score(profile: GamificationProfile) -> int:
-        """
-        Calculate a gamified score for a donor based on multiple factors:
-        - donations_milestone: each donation = 10 points
-        - emergency donations: each emergency donation = 20 points
-        - current streak: each day in streak = 5 points
-        - longest streak bonus: each day = 2 points
-        """
-        donations_points = profile.donations_milestone * 10
-        emergency_points = profile.achievements.get("emergency_donations", 0) * 20
-        streak_points = profile.current_streak * 5
-        longest_streak_points = profile.longest_streak * 2
-
-        total_score = donations_points + emergency_points + streak_points + longest_streak_points
-        return total_score
-
-    @staticmethod
-    def get_points_leaderboard(session: Session, top_n: int = 10):
-        """
-        Returns the top N donors based on calculated gamified points.
-        """
-        profiles = session.query(GamificationProfile).all()
-
-        # Create a sortable list with scores
-        leaderboard_list = []
-        for profile in profiles:
-            score = LeaderboardService.calculate_score(profile)
-            leaderboard_list.append({
-                "user_id": profile.user_id,
-                "score": score,
-                "donations": profile.donations_milestone,
-                "emergency_donations": profile.achievements.get("emergency_donations", 0),
-                "current_streak": profile.current_streak,
-                "longest_streak": profile.longest_streak,
-                "badges": profile.badges
-            })
-
-        # Sort descending by score
-        leaderboard_list.sort(key=lambda x: x["score"], reverse=True)
-
-        # Assign ranks
-        for rank, entry in enumerate(leaderboard_list, start=1):
-            entry["rank"] = rank
-
-        return leaderboard_list[:top_n]
-    def add_points(self, user_id: str, points: int):
-        """Add points to a donor’s score"""
-        profile = self.session.query(GamificationProfile).filter_by(user_id=user_id).first()
-        if not profile:
-            print(f"[Gamification] User {user_id} not found. Creating profile.")
-            profile = GamificationProfile(user_id=user_id)
-            self.session.add(profile)
-            self.session.commit()
-
-        profile.total_points += points
-        self.session.commit()
+# backend/app/models/gamification.py
+import math
+from typing import Optional
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, JSON, Index, event, inspect, select, update
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from ..config import settings
+from ..database import Base
+from .user import User
 
+class GamificationProfile(Base):
+    __tablename__ = "gamification_profiles"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, ForeignKey("users.user_id"), unique=True, nullable=False)
+
+    # Points & progress
+    total_points = Column(Integer, default=0)
+    donations_milestone = Column(Integer, default=0)
+    current_streak = Column(Integer, default=0)
+    longest_streak = Column(Integer, default=0)
+
+    # Rewards
+    achievements = Column(JSON, default=dict)  # e.g. {"emergency_donations": 2}
+    badges = Column(JSON, default=list)
+
+    # Leaderboard columns, maintained on every write (see listeners below)
+    score = Column(Integer, default=0, nullable=False)
+    region = Column(String, nullable=True)       # region_of(user's latitude, longitude)
+    blood_group = Column(String, nullable=True)  # user's blood group, e.g. "A+"
+    # Highest point award seq applied to this profile (services.point_award_queue)
+    last_award_seq = Column(Integer, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Relationships
+    user = relationship("User", back_populates="gamification_profile")
+
+
+class PointAwardJournal(Base):
+    """One process's point award journal file, and the last award seq of it already applied"""
+    __tablename__ = "point_award_journals"
+
+    id = Column(Integer, primary_key=True)
+    applied_seq = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class PointAwardSeqBlock(Base):
+    """A block of POINT_AWARD_SEQ_BLOCK award seqs reserved by one process; block n holds seqs after (n-1) * size"""
+    __tablename__ = "point_award_seq_blocks"
+
+    id = Column(Integer, primary_key=True)
+    journal_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# Leaderboard order is (score DESC, user_id); each index serves one leaderboard scope
+Index("ix_gamification_profiles_score_rank", GamificationProfile.score.desc(), GamificationProfile.user_id)
+Index("ix_gamification_profiles_region_rank",
+      GamificationProfile.region, GamificationProfile.score.desc(), GamificationProfile.user_id)
+Index("ix_gamification_profiles_blood_group_rank",
+      GamificationProfile.blood_group, GamificationProfile.score.desc(), GamificationProfile.user_id)
+
+
+def profile_score(profile: GamificationProfile) -> int:
+    """
+    Gamified score of a profile:
+    - donations_milestone: each donation = 10 points
+    - emergency donations: each emergency donation = 20 points
+    - current streak: each day in streak = 5 points
+    - longest streak bonus: each day = 2 points
+    """
+    donations_points = (profile.donations_milestone or 0) * 10
+    emergency_points = (profile.achievements or {}).get("emergency_donations", 0) * 20
+    streak_points = (profile.current_streak or 0) * 5
+    longest_streak_points = (profile.longest_streak or 0) * 2
+    return donations_points + emergency_points + streak_points + longest_streak_points
+
+
+def region_of(latitude: Optional[float], longitude: Optional[float]) -> Optional[str]:
+    """Grid cell of LEADERBOARD_REGION_DEG degrees containing a location, e.g. "17,78" """
+    if latitude is None or longitude is None:
+        return None
+    size = settings.LEADERBOARD_REGION_DEG
+    return f"{math.floor(latitude / size) * size:g},{math.floor(longitude / size) * size:g}"
+
+
+def user_leaderboard_attributes(blood_group, latitude, longitude) -> dict:
+    return {"blood_group": getattr(blood_group, "value", blood_group), "region": region_of(latitude, longitude)}
+
+
+@event.listens_for(GamificationProfile, "before_insert")
+def _materialize_new_profile(mapper, connection, profile):
+    profile.score = profile_score(profile)
+    user = connection.execute(
+        select(User.blood_group, User.latitude, User.longitude).where(User.user_id == profile.user_id)
+    ).first()
+    if user is not None:
+        for name, value in user_leaderboard_attributes(*user).items():
+            setattr(profile, name, value)
+
+
+@event.listens_for(GamificationProfile, "before_update")
+def _materialize_score(mapper, connection, profile):
+    profile.score = profile_score(profile)
+
+
+@event.listens_for(User, "after_update")
+def _follow_user_attributes(mapper, connection, user):
+    state = inspect(user)
+    if any(state.attrs[name].history.has_changes() for name in ("blood_group", "latitude", "longitude")):
+        connection.execute(
+            update(GamificationProfile)
+            .where(GamificationProfile.user_id == user.user_id)
+            .values(**user_leaderboard_attributes(user.blood_group, user.latitude, user.longitude))
+        )
@@ -1,5 +1,5 @@
 # backend/app/models/user.py
-from sqlalchemy import Column, String, Float, Boolean, Date, DateTime, Integer, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, String, Float, Boolean, Date, DateTime, Integer, ForeignKey, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -24,7 +24,9 @@ class BloodGroup(str, enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
-    
+    # Per-blood-group coordinate index backing the matcher's bounding-box prefilter
+    __table_args__ = (Index("ix_users_blood_group_lat_lon", "blood_group", "latitude", "longitude"),)
+
     # Primary fields from CSV
     user_id = Column(String, primary_key=True, index=True)
     bridge_id = Column(String, nullable=True)
@@ -69,6 +71,8 @@ class User(Base):
     
     # System fields
     registration_date = Column(Date, nullable=True)
+    # Hash of the normalized registry row, used by the delta import to skip unchanged rows
+    row_fingerprint = Column(String(32), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -0,0 +1,118 @@
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import numpy as np
+
+from ..models.user import BloodGroup
+
+# -----------------------------
+# Source table: donor group -> recipient groups it can give to
+# -----------------------------
+BLOOD_COMPATIBILITY: Dict[str, List[str]] = {
+    "O-": ["O-", "O+", "A-", "A+", "B-", "B+", "AB-", "AB+"],
+    "O+": ["O+", "A+", "B+", "AB+"],
+    "A-": ["A-", "A+", "AB-", "AB+"],
+    "A+": ["A+", "AB+"],
+    "B-": ["B-", "B+", "AB-", "AB+"],
+    "B+": ["B+", "AB+"],
+    "AB-": ["AB-", "AB+"],
+    "AB+": ["AB+"]
+}
+
+# -----------------------------
+# Lookup tables, built once at import
+# -----------------------------
+BLOOD_GROUPS: Tuple[BloodGroup, ...] = tuple(BloodGroup)
+
+# Enum ordinal per group; -1 is used for unknown / missing groups
+BLOOD_GROUP_CODES: Dict[BloodGroup, int] = {group: code for code, group in enumerate(BLOOD_GROUPS)}
+
+# COMPATIBLE[donor_code, recipient_code]
+COMPATIBLE = np.zeros((len(BLOOD_GROUPS), len(BLOOD_GROUPS)), dtype=bool)
+for _donor, _recipients in BLOOD_COMPATIBILITY.items():
+    for _recipient in _recipients:
+        COMPATIBLE[BLOOD_GROUP_CODES[BloodGroup(_donor)], BLOOD_GROUP_CODES[BloodGroup(_recipient)]] = True
+
+# Matching score component: 1.0 for an identical group, 0.8 for any other compatible one
+COMPATIBILITY_SCORE = np.where(np.eye(len(BLOOD_GROUPS), dtype=bool), 1.0, 0.8) * COMPATIBLE
+
+# recipient -> donors that can give to it, and donor -> recipients it can give to
+DONORS_FOR: Dict[BloodGroup, FrozenSet[BloodGroup]] = {
+    recipient: frozenset(BLOOD_GROUPS[d] for d in np.flatnonzero(COMPATIBLE[:, r]))
+    for r, recipient in enumerate(BLOOD_GROUPS)
+}
+RECIPIENTS_FOR: Dict[BloodGroup, FrozenSet[BloodGroup]] = {
+    donor: frozenset(BLOOD_GROUPS[r] for r in np.flatnonzero(COMPATIBLE[d, :]))
+    for d, donor in enumerate(BLOOD_GROUPS)
+}
+
+# Bit i set when the group with code i is compatible; one mask per recipient / donor
+DONOR_MASKS = np.array([sum(1 << int(d) for d in np.flatnonzero(COMPATIBLE[:, r])) for r in range(len(BLOOD_GROUPS))], dtype=np.uint16)
+RECIPIENT_MASKS = np.array([sum(1 << int(r) for r in np.flatnonzero(COMPATIBLE[d, :])) for d in range(len(BLOOD_GROUPS))], dtype=np.uint16)
+
+# Donor groups per recipient value, in BLOOD_COMPATIBILITY order
+_DONOR_VALUES_FOR: Dict[str, Tuple[str, ...]] = {
+    recipient.value: tuple(donor for donor, recipients in BLOOD_COMPATIBILITY.items() if recipient.value in recipients)
+    for recipient in BLOOD_GROUPS
+}
+
+# Every accepted spelling (upper-cased) -> canonical value
+_CANONICAL: Dict[str, str] = {}
+for _group in BLOOD_GROUPS:
+    _abo, _rh = _group.value[:-1], _group.value[-1]
+    _CANONICAL[_group.value] = _group.value
+    _CANONICAL[f"{_abo} {'POSITIVE' if _rh == '+' else 'NEGATIVE'}"] = _group.value
+
+
+# -----------------------------
+# Normalization
+# -----------------------------
+def normalize_blood_group(bg: str) -> str:
+    """Canonical form ("A Positive" -> "A+"); unknown strings come back stripped and upper-cased"""
+    if not isinstance(bg, str):
+        return ""
+    bg = bg.strip().upper()
+    return _CANONICAL.get(bg, bg)
+
+
+def normalize_blood_group_series(series):
+    """normalize_blood_group over a pandas Series, evaluated once per distinct value"""
+    return series.map({value: normalize_blood_group(value) for value in series.unique()})
+
+
+def parse_blood_group(bg) -> Optional[BloodGroup]:
+    """BloodGroup for any accepted spelling, or None"""
+    if isinstance(bg, BloodGroup):
+        return bg
+    canonical = normalize_blood_group(bg)
+    return BloodGroup(canonical) if canonical in _DONOR_VALUES_FOR else None
+
+
+def blood_group_code(bg) -> int:
+    """Enum ordinal for any accepted spelling, -1 when unknown"""
+    group = parse_blood_group(bg)
+    return BLOOD_GROUP_CODES[group] if group is not None else -1
+
+
+# -----------------------------
+# Lookups
+# -----------------------------
+def compatible_donor_groups(recipient) -> List[str]:
+    """Donor group values that can give to the recipient group"""
+    return list(_DONOR_VALUES_FOR.get(normalize_blood_group(recipient), ()))
+
+
+def compatibility_score(donor, recipient) -> float:
+    """1.0 for the same group, 0.8 for a compatible one, 0.0 otherwise (or when either is unknown)"""
+    donor_code, recipient_code = blood_group_code(donor), blood_group_code(recipient)
+    if donor_code < 0 or recipient_code < 0:
+        return 0.0
+    return float(COMPATIBILITY_SCORE[donor_code, recipient_code])
+
+
+def donor_compatible_mask(donor_codes: np.ndarray, recipient_code: int) -> np.ndarray:
+    """Boolean array: which donor codes can give to recipient_code (unknown codes are never compatible)"""
+    donor_codes = np.asarray(donor_codes)
+    if recipient_code < 0:
+        return np.zeros(donor_codes.shape, dtype=bool)
+    known = donor_codes >= 0
+    shifts = np.where(known, donor_codes, 0).astype(np.uint16)
+    return known & ((DONOR_MASKS[recipient_code] >> shifts) & 1).astype(bool)
@@ -1,12 +1,38 @@
-from typing import List, Dict
+from typing import List, Dict, NamedTuple, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
 from datetime import datetime
+from collections import defaultdict
+import heapq
 import math
-from ..models.user import User, BloodGroup
+import numpy as np
+from ..models.user import User, BloodGroup, UserRole
 from ..database import get_db
 from ..models.bridge_relationship import BridgeRelationship
 from ..config import settings
+from .geo_index import bounding_box, haversine_matrix_km
+from .donor_scoring import donor_columns, score_donors, top_k_indices
+from .blood_compatibility import (
+    BLOOD_COMPATIBILITY, blood_group_code, compatibility_score, compatible_donor_groups
+)
+
+
+class _Ranking(NamedTuple):
+    """One patient's candidate donors, best first; a (donor, score, distance) tuple is built only when read"""
+    donors: List[User]
+    scores: np.ndarray      # this patient's score row
+    distances: np.ndarray   # this patient's distance row
+    order: np.ndarray       # donor indices, best score first
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def candidate(self, rank: int) -> tuple:
+        i = self.order[rank]
+        return self.donors[i], self.scores[i], self.distances[i]
+
+    def head(self, n: int) -> List[tuple]:
+        return [self.candidate(rank) for rank in range(min(n, len(self.order)))]
 
 
 class BloodMatchingService:
@@ -16,17 +42,8 @@ class BloodMatchingService:
     multi-factor scoring for optimal donor selection.
     """
     
-    # Blood compatibility matrix
-    BLOOD_COMPATIBILITY = {
-        "O-": ["O-", "O+", "A-", "A+", "B-", "B+", "AB-", "AB+"],
-        "O+": ["O+", "A+", "B+", "AB+"],
-        "A-": ["A-", "A+", "AB-", "AB+"],
-        "A+": ["A+", "AB+"],
-        "B-": ["B-", "B+", "AB-", "AB+"],
-        "B+": ["B+", "AB+"],
-        "AB-": ["AB-", "AB+"],
-        "AB+": ["AB+"]
-    }
+    # Blood compatibility matrix (donor -> recipients); lookups go through blood_compatibility
+    BLOOD_COMPATIBILITY = BLOOD_COMPATIBILITY
     
     @staticmethod
     def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -41,11 +58,7 @@ class BloodMatchingService:
     @classmethod
     def get_compatible_blood_groups(cls, patient_blood_group: str) -> List[str]:
         """Return compatible donor blood groups for a patient"""
-        compatible_donors = []
-        for donor_group, can_donate_to in cls.BLOOD_COMPATIBILITY.items():
-            if patient_blood_group in can_donate_to:
-                compatible_donors.append(donor_group)
-        return compatible_donors
+        return compatible_donor_groups(patient_blood_group)
     
     @classmethod
     def calculate_donor_score(cls, donor: User, patient: User, distance_km: float) -> float:
@@ -53,12 +66,10 @@ class BloodMatchingService:
         score = 0.0
 
         # 1. Blood compatibility (40%)
-        compatible_groups = cls.get_compatible_blood_groups(patient.blood_group.value)
-        if donor.blood_group.value in compatible_groups:
-            compatibility_score = 1.0 if donor.blood_group.value == patient.blood_group.value else 0.8
-        else:
+        compatibility = compatibility_score(donor.blood_group, patient.blood_group)
+        if not compatibility:
             return 0.0
-        score += compatibility_score * settings.COMPATIBILITY_WEIGHT
+        score += compatibility * settings.COMPATIBILITY_WEIGHT
 
         # 2. Distance (30%)
         distance_score = 1.0 - (distance_km / settings.MAX_DISTANCE_KM) if distance_km <= settings.MAX_DISTANCE_KM else 0.0
@@ -98,42 +109,162 @@ class BloodMatchingService:
         if not patient:
             return []
 
+        if not (patient.latitude and patient.longitude):
+            return []
+
         compatible_groups = cls.get_compatible_blood_groups(patient.blood_group.value)
         query = db.query(User).filter(
             and_(
-                User.role == "donor",
+                User.role == UserRole.DONOR,
                 User.blood_group.in_(compatible_groups),
                 User.user_donation_active_status != "inactive"
             )
         )
         if emergency:
             query = query.filter(User.eligibility_status == "eligible")
+        else:
+            # Only rows inside the radius' bounding box can be within MAX_DISTANCE_KM
+            box = bounding_box(patient.latitude, patient.longitude, settings.MAX_DISTANCE_KM)
+            query = query.filter(
+                User.latitude.between(box.min_lat, box.max_lat),
+                User.longitude.between(box.min_lon, box.max_lon)
+            )
 
         potential_donors = query.all()
-        donor_scores = []
+        candidates = []
+        distances = []
 
         for donor in potential_donors:
-            if not (donor.latitude and donor.longitude and patient.latitude and patient.longitude):
+            if not (donor.latitude and donor.longitude):
                 continue
             distance = cls.haversine_distance(patient.latitude, patient.longitude, donor.latitude, donor.longitude)
             if not emergency and distance > settings.MAX_DISTANCE_KM:
                 continue
+            candidates.append(donor)
+            distances.append(distance)
+
+        if not candidates:
+            return []
+
+        # Score the whole candidate set in one vectorized pass
+        scores = score_donors(
+            **donor_columns(candidates, distances),
+            patient_code=blood_group_code(patient.blood_group)
+        )
+        positive = np.flatnonzero(scores > 0)
+        top = positive[top_k_indices(scores[positive], limit)]
+        return [cls._match(candidates[i], scores[i], distances[i]) for i in top]
+
+    @staticmethod
+    def _match(donor: User, score: float, distance_km: float) -> Dict:
+        return {
+            "donor": donor,
+            "score": float(score),
+            "distance_km": round(float(distance_km), 2),
+            "blood_group": donor.blood_group.value,
+            "eligibility_status": donor.eligibility_status,
+            "donations_count": donor.donations_till_date or 0,
+            "last_donation_date": donor.last_donation_date,
+            "next_eligible_date": donor.next_eligible_date
+        }
+
+    @classmethod
+    def find_matching_donors_batch(cls, db: Session, patient_ids: List[str], limit: int = 10, emergency: bool = False,
+                                   max_patients_per_donor: Optional[int] = None) -> Dict[str, List[Dict]]:
+        """
+        Top donor matches for many patients at once: {patient_id: matches}, in request order.
+
+        Patients are grouped by blood group. Each group loads its donor pool once
+        and scores a patients x donors distance matrix in one vectorized pass, with
+        the same filters and scoring as find_matching_donors. With
+        max_patients_per_donor, no donor is proposed to more patients than that:
+        pairs are handed out best score first across the whole batch.
+        """
+        patient_ids = list(dict.fromkeys(patient_ids))
+        patients = db.query(User).filter(User.user_id.in_(patient_ids)).all()
+        by_group: Dict[BloodGroup, List[User]] = defaultdict(list)
+        for patient in patients:
+            if patient.latitude and patient.longitude and patient.blood_group is not None:
+                by_group[patient.blood_group].append(patient)
+
+        # Per patient: candidate donors, their scores and distances, best first
+        ranked: Dict[str, _Ranking] = {}
+        for group, members in by_group.items():
+            donors = cls._donor_pool(db, group, members, emergency)
+            if not donors:
+                continue
+            located = [donor for donor in donors if donor.latitude and donor.longitude]
+            if not located:
+                continue
+            columns = donor_columns(located, np.zeros(len(located)))
+            distances = haversine_matrix_km(
+                [p.latitude for p in members], [p.longitude for p in members],
+                [d.latitude for d in located], [d.longitude for d in located]
+            )
+            columns["distance_km"] = distances
+            scores = score_donors(**columns, patient_code=blood_group_code(group))
+            if not emergency:
+                scores = np.where(distances <= settings.MAX_DISTANCE_KM, scores, 0.0)
+
+            # Load limiting may skip any number of donors, so it gets every positive score in order
+            depth = limit if max_patients_per_donor is None else len(located)
+            for row, patient in enumerate(members):
+                positive = np.flatnonzero(scores[row] > 0)
+                order = positive[top_k_indices(scores[row, positive], depth)]
+                ranked[patient.user_id] = _Ranking(located, scores[row], distances[row], order)
+
+        if max_patients_per_donor is not None:
+            assigned = cls._limit_donor_load(patient_ids, ranked, limit, max_patients_per_donor)
+        else:
+            assigned = {patient_id: ranking.head(limit) for patient_id, ranking in ranked.items()}
+        return {
+            patient_id: [cls._match(*candidate) for candidate in assigned.get(patient_id, [])[:limit]]
+            for patient_id in patient_ids
+        }
 
-            score = cls.calculate_donor_score(donor, patient, distance)
-            if score > 0:
-                donor_scores.append({
-                    "donor": donor,
-                    "score": score,
-                    "distance_km": round(distance, 2),
-                    "blood_group": donor.blood_group.value,
-                    "eligibility_status": donor.eligibility_status,
-                    "donations_count": donor.donations_till_date or 0,
-                    "last_donation_date": donor.last_donation_date,
-                    "next_eligible_date": donor.next_eligible_date
-                })
-
-        donor_scores.sort(key=lambda x: x["score"], reverse=True)
-        return donor_scores[:limit]
+    @staticmethod
+    def _donor_pool(db: Session, group: BloodGroup, patients: List[User], emergency: bool) -> List[User]:
+        """Donors compatible with group, restricted to the union of the patients' radius boxes"""
+        query = db.query(User).filter(
+            and_(
+                User.role == UserRole.DONOR,
+                User.blood_group.in_(compatible_donor_groups(group.value)),
+                User.user_donation_active_status != "inactive"
+            )
+        )
+        if emergency:
+            return query.filter(User.eligibility_status == "eligible").all()
+        boxes = [bounding_box(p.latitude, p.longitude, settings.MAX_DISTANCE_KM) for p in patients]
+        return query.filter(
+            User.latitude.between(min(b.min_lat for b in boxes), max(b.max_lat for b in boxes)),
+            User.longitude.between(min(b.min_lon for b in boxes), max(b.max_lon for b in boxes))
+        ).all()
+
+    @staticmethod
+    def _limit_donor_load(patient_ids: List[str], ranked: Dict[str, _Ranking], limit: int,
+                          max_patients_per_donor: int) -> Dict[str, List[tuple]]:
+        """
+        Greedy best-score-first assignment: each patient takes up to limit donors,
+        each donor goes to at most max_patients_per_donor patients. Equal scores
+        go to the patient listed first. Each patient's ranking is walked one
+        candidate at a time, so only the candidates considered are materialized.
+        """
+        order = {patient_id: i for i, patient_id in enumerate(patient_ids)}
+        heap = [(-ranking.scores[ranking.order[0]], order[pid], pid, 0) for pid, ranking in ranked.items() if len(ranking)]
+        heapq.heapify(heap)
+        load: Dict[str, int] = defaultdict(int)
+        assigned: Dict[str, List[tuple]] = defaultdict(list)
+        while heap:
+            _, position, patient_id, rank = heapq.heappop(heap)
+            ranking = ranked[patient_id]
+            candidate = ranking.candidate(rank)
+            donor_id = candidate[0].user_id
+            if load[donor_id] < max_patients_per_donor:
+                load[donor_id] += 1
+                assigned[patient_id].append(candidate)
+            if len(assigned[patient_id]) < limit and rank + 1 < len(ranking):
+                heapq.heappush(heap, (-ranking.scores[ranking.order[rank + 1]], position, patient_id, rank + 1))
+        return assigned
     
     @classmethod
     def create_bridge_relationship(cls, db: Session, patient_id: str, donor_id: str, compatibility_score: float = None) -> BridgeRelationship:
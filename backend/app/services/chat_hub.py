@@ -0,0 +1,337 @@
+import asyncio
+import itertools
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+from ..config import settings
+from .chat_log import ChatLog, message_frame
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOM = "global"
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "disconnect")
+
+# (room, message) handler the hub registers with its broker
+MessageHandler = Callable[[str, Dict], Awaitable[None]]
+# A message rendered once per delivery: (seq, "Message: ..." text, JSON frame)
+Frame = Tuple[int, str, str]
+
+
+# -----------------------------
+# Brokers
+# -----------------------------
+class InMemoryBroker:
+    """Single-process broker: publish hands messages straight back to this worker's hub"""
+
+    def __init__(self, initial_seq: Optional[Callable[[str], Awaitable[int]]] = None):
+        self._handler: Optional[MessageHandler] = None
+        self._rooms: Set[str] = set()
+        self._seqs: Dict[str, int] = {}
+        # Last seq a room used before this process (the chat log's), so seqs keep increasing
+        self._initial_seq = initial_seq
+
+    async def start(self, handler: MessageHandler):
+        self._handler = handler
+
+    async def subscribe(self, room: str):
+        self._rooms.add(room)
+
+    async def unsubscribe(self, room: str):
+        self._rooms.discard(room)
+
+    async def next_seq(self, room: str) -> int:
+        if room not in self._seqs:
+            start = await self._initial_seq(room) if self._initial_seq else 0
+            self._seqs.setdefault(room, start)
+        self._seqs[room] += 1
+        return self._seqs[room]
+
+    async def publish(self, room: str, message: Dict):
+        if room in self._rooms:
+            await self._handler(room, message)
+
+    async def close(self):
+        self._rooms.clear()
+
+
+class RedisBroker:
+    """
+    Cross-worker broker on Redis pub/sub: every worker subscribes to the rooms
+    it has members in and delivers what any worker publishes there. Room
+    sequence numbers come from INCR, so they are shared by all workers; a
+    room's counter is seeded (SET NX) from the chat log's last seq, so it keeps
+    increasing when the Redis key has been lost.
+    """
+
+    CHANNEL_PREFIX = "tcare:chat:"
+
+    def __init__(self, url: str, initial_seq: Optional[Callable[[str], Awaitable[int]]] = None):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._pubsub = self._redis.pubsub()
+        self._handler: Optional[MessageHandler] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._initial_seq = initial_seq
+        self._seeded: Set[str] = set()
+
+    async def start(self, handler: MessageHandler):
+        self._handler = handler
+
+    async def subscribe(self, room: str):
+        await self._pubsub.subscribe(self.CHANNEL_PREFIX + room)
+        if self._reader is None or self._reader.done():
+            # listen() needs a subscription and returns once the last channel is
+            # unsubscribed, so a reader starts with the first room after each gap
+            if self._reader is not None and not self._reader.cancelled() and self._reader.exception():
+                logger.error(f"Chat broker: reader stopped: {self._reader.exception()}")
+            self._reader = asyncio.create_task(self._read())
+
+    async def unsubscribe(self, room: str):
+        await self._pubsub.unsubscribe(self.CHANNEL_PREFIX + room)
+
+    async def _read(self):
+        async for event in self._pubsub.listen():
+            if event["type"] != "message":
+                continue
+            room = event["channel"].decode()[len(self.CHANNEL_PREFIX):]
+            try:
+                await self._handler(room, json.loads(event["data"]))
+            except Exception as e:
+                logger.error(f"Chat broker: delivery to {room!r} failed: {e}")
+
+    async def next_seq(self, room: str) -> int:
+        key = f"{self.CHANNEL_PREFIX}seq:{room}"
+        if room not in self._seeded:
+            if self._initial_seq is not None:
+                await self._redis.set(key, await self._initial_seq(room), nx=True)
+            self._seeded.add(room)
+        return await self._redis.incr(key)
+
+    async def publish(self, room: str, message: Dict):
+        await self._redis.publish(self.CHANNEL_PREFIX + room, json.dumps(message))
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+        await self._pubsub.close()
+        await self._redis.close()
+
+
+def create_broker(url: str = "", initial_seq: Optional[Callable[[str], Awaitable[int]]] = None):
+    """Broker for CHAT_BROKER_URL: "redis://..." for Redis, empty for in-process"""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker(url, initial_seq)
+    if url:
+        raise ValueError(f"Unsupported chat broker URL: {url!r}")
+    return InMemoryBroker(initial_seq)
+
+
+# -----------------------------
+# Hub
+# -----------------------------
+class Subscriber:
+    """
+    One socket in one room, with its own bounded send queue drained by a writer
+    task. Seq-aware subscribers (json_frames) get JSON frames, and while they
+    catch up on history the writer holds live messages back, then skips those
+    the catch-up already sent (seq <= floor).
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, hub: "ChatHub", room: str, ws: WebSocket, queue_size: int, json_frames: bool = False):
+        self.id = next(self._ids)
+        self.hub = hub
+        self.room = room
+        self.ws = ws
+        self.json_frames = json_frames
+        self.floor = 0
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.closed = False
+        self.ready = asyncio.Event()
+        if not json_frames:
+            self.ready.set()
+        self.writer = asyncio.create_task(self._write())
+
+    async def _write(self):
+        try:
+            await self.ready.wait()
+            while True:
+                seq, text, frame = await self.queue.get()
+                if self.json_frames:
+                    if seq > self.floor:
+                        await self.ws.send_text(frame)
+                else:
+                    await self.ws.send_text(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # The socket went away; the receive loop notices and leaves the room
+            self.closed = True
+
+    def offer(self, frame: Frame) -> bool:
+        """Queue a frame without waiting; False when the subscriber should be disconnected"""
+        if self.closed:
+            return True
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            if self.hub.policy == "disconnect":
+                return False
+            self.queue.get_nowait()
+            self.queue.put_nowait(frame)
+            self.dropped += 1
+            self.hub.dropped += 1
+            return True
+
+
+class ChatHub:
+    """
+    Rooms of WebSocket subscribers. Publishing goes through the broker, which
+    may fan out to other workers; each worker delivers to its local members by
+    queueing on every subscriber's bounded send queue without awaiting, so a
+    slow client only ever delays itself. A full queue is handled by the
+    slow-consumer policy: drop the oldest queued message, or disconnect.
+    With a ChatLog, published messages are also appended to the room's
+    history, and joining with `since` replays what was missed.
+    """
+
+    def __init__(self, broker=None, queue_size: Optional[int] = None, policy: Optional[str] = None,
+                 log: Optional[ChatLog] = None):
+        self.broker = broker or InMemoryBroker()
+        self.log = log
+        self.queue_size = queue_size or settings.CHAT_SEND_QUEUE_SIZE
+        self.policy = policy or settings.CHAT_SLOW_CONSUMER_POLICY
+        if self.policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {self.policy!r}")
+        self.worker_id = uuid.uuid4().hex
+        self.rooms: Dict[str, Dict[int, Subscriber]] = {}
+        self.dropped = 0
+        self.disconnected = 0
+        self._started = False
+
+    async def start(self):
+        if not self._started:
+            await self.broker.start(self._deliver)
+            if self.log is not None:
+                await self.log.start()
+            self._started = True
+
+    async def join(self, room: str, ws: WebSocket, since: Optional[int] = None) -> Subscriber:
+        """
+        Add a socket to a room. With `since` (the last seq the client saw) it
+        gets JSON frames, starting with the messages it missed: up to
+        CHAT_CATCHUP_MAX_MESSAGES of the latest ones, so a client that sees a
+        seq gap pages the rest from the history API.
+        """
+        subscriber = Subscriber(self, room, ws, self.queue_size, json_frames=since is not None)
+        members = self.rooms.get(room)
+        if members is None:
+            members = self.rooms[room] = {}
+            await self.broker.subscribe(room)
+        members[subscriber.id] = subscriber
+        if since is not None:
+            # Already a member, so nothing published from here on is missed;
+            # the writer holds live messages until the catch-up is sent
+            subscriber.floor = since
+            try:
+                if self.log is not None:
+                    missed = await self.log.history(room, limit=settings.CHAT_CATCHUP_MAX_MESSAGES)
+                    for message in missed:
+                        if message["seq"] > since:
+                            await ws.send_text(json.dumps(message))
+                            subscriber.floor = message["seq"]
+            finally:
+                subscriber.ready.set()
+        return subscriber
+
+    async def leave(self, subscriber: Subscriber):
+        subscriber.closed = True
+        subscriber.writer.cancel()
+        members = self.rooms.get(subscriber.room)
+        if members is None or members.pop(subscriber.id, None) is None:
+            return
+        if not members:
+            del self.rooms[subscriber.room]
+            await self.broker.unsubscribe(subscriber.room)
+
+    async def publish(self, room: str, text: str, sender: Optional[Subscriber] = None) -> Dict:
+        message = {
+            "room": room,
+            "seq": await self.broker.next_seq(room),
+            "text": text,
+            "sent_at": datetime.now(timezone.utc).isoformat(),
+            "worker": self.worker_id,
+            "sender": sender.id if sender else None,
+        }
+        if self.log is not None:
+            self.log.append(message)
+        await self.broker.publish(room, message)
+        return message
+
+    @staticmethod
+    def render(message: Dict) -> str:
+        return f"Message: {message['text']}"
+
+    async def _deliver(self, room: str, message: Dict):
+        members = self.rooms.get(room)
+        if not members:
+            return
+        sender = message["sender"] if message["worker"] == self.worker_id else None
+        frame = (message["seq"], self.render(message), json.dumps(message_frame(message)))
+        slow = [s for s in list(members.values()) if s.id != sender and not s.offer(frame)]
+        for subscriber in slow:
+            self.disconnected += 1
+            await self.leave(subscriber)
+            # 1013: try again later
+            asyncio.create_task(subscriber.ws.close(code=1013))
+
+    def stats(self) -> Dict:
+        return {
+            "rooms": {room: len(members) for room, members in self.rooms.items()},
+            "subscribers": sum(len(members) for members in self.rooms.values()),
+            "policy": self.policy,
+            "queue_size": self.queue_size,
+            "dropped": self.dropped,
+            "disconnected": self.disconnected,
+        }
+
+    async def close(self):
+        for members in list(self.rooms.values()):
+            for subscriber in list(members.values()):
+                await self.leave(subscriber)
+        await self.broker.close()
+        if self.log is not None:
+            await self.log.close()
+
+
+# Process-wide hub, created on first connection
+_hub: Optional[ChatHub] = None
+_hub_lock = asyncio.Lock()
+
+
+async def get_chat_hub() -> ChatHub:
+    global _hub
+    if _hub is None:
+        async with _hub_lock:
+            if _hub is None:
+                log = ChatLog()
+                hub = ChatHub(create_broker(settings.CHAT_BROKER_URL, initial_seq=log.last_seq), log=log)
+                await hub.start()
+                _hub = hub
+    return _hub
+
+
+async def shutdown_chat_hub():
+    global _hub
+    if _hub is not None:
+        hub, _hub = _hub, None
+        await hub.close()
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.chat_message import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+def message_frame(message: Dict) -> Dict:
+    """Public shape of a message, as sent to seq-aware clients and returned by history"""
+    return {"room": message["room"], "seq": message["seq"], "text": message["text"], "sent_at": message["sent_at"]}
+
+
+def _utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything is stored in UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class ChatLog:
+    """
+    Append-only chat history per channel in chat_messages.
+
+    append() only queues the message; a background task writes queued messages
+    in batches (executemany INSERT) every flush_interval seconds or once
+    batch_size are waiting, so broadcasting never waits for the database.
+    Reads are keyset pages on the (channel, seq) index, merged with messages
+    still queued, so they cost O(page) however long the channel is. A
+    periodic prune enforces the age and per-channel size limits.
+
+    A message whose (channel, seq) is already stored is skipped, so a batch
+    rewritten after an interrupted flush, or a seq reused after the broker's
+    counter was reset, never blocks the batches behind it. While the database
+    is unreachable at most max_pending messages wait behind the batch being
+    written; beyond that the oldest waiting ones are dropped.
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None,
+                 batch_size: Optional[int] = None, flush_interval: Optional[float] = None,
+                 retention_days: Optional[int] = None, max_per_channel: Optional[int] = None,
+                 prune_interval: Optional[float] = None, max_pending: Optional[int] = None):
+        if session_factory is None:
+            from ..database import SessionLocal
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.CHAT_LOG_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.CHAT_LOG_FLUSH_SECONDS
+        self.retention_days = settings.CHAT_RETENTION_DAYS if retention_days is None else retention_days
+        self.max_per_channel = settings.CHAT_MAX_MESSAGES_PER_CHANNEL if max_per_channel is None else max_per_channel
+        self.prune_interval = prune_interval or settings.CHAT_PRUNE_INTERVAL_SECONDS
+        self.max_pending = max_pending or settings.CHAT_LOG_MAX_PENDING
+        self.dropped = 0
+
+        self._pending: List[Dict] = []  # appended, not yet written; only touched on the event loop
+        self._in_flight = 0  # leading _pending messages the current flush is writing
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    def append(self, message: Dict):
+        if len(self._pending) - self._in_flight >= self.max_pending:
+            # Never one in flight: the flush removes its batch from the front once written
+            del self._pending[self._in_flight]
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Chat log: queue full, {self.dropped} messages dropped so far")
+        self._pending.append(message)
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_prune = loop.time() + self.prune_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+            if loop.time() >= next_prune:
+                next_prune = loop.time() + self.prune_interval
+                try:
+                    removed = await asyncio.to_thread(self.prune)
+                    if removed:
+                        logger.info(f"Chat log: pruned {removed} messages")
+                except Exception as e:
+                    logger.error(f"Chat log: prune failed: {e}")
+
+    async def flush(self):
+        """
+        Write every queued message. A batch that violates a constraint is
+        dropped; any other failure leaves it queued for the next round.
+        """
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                self._in_flight = len(batch)
+                try:
+                    await asyncio.to_thread(self._write, batch)
+                except IntegrityError as e:
+                    logger.error(f"Chat log: dropping {len(batch)} messages that cannot be stored: {e}")
+                except Exception as e:
+                    logger.error(f"Chat log: writing {len(batch)} messages failed, will retry: {e}")
+                    return
+                finally:
+                    self._in_flight = 0
+                del self._pending[:len(batch)]
+
+    @staticmethod
+    def _insert_statement(session: Session):
+        """INSERT that skips a (channel, seq) already stored, where the dialect supports it"""
+        dialect = session.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            return insert(ChatMessage)
+        return dialect_insert(ChatMessage).on_conflict_do_nothing(index_elements=["channel", "seq"])
+
+    def _write(self, batch: List[Dict]):
+        with self.session_factory() as session:
+            session.execute(self._insert_statement(session), [
+                {
+                    "channel": message["room"],
+                    "seq": message["seq"],
+                    "text": message["text"],
+                    "sender": None if message.get("sender") is None else str(message["sender"]),
+                    "sent_at": datetime.fromisoformat(message["sent_at"]),
+                }
+                for message in batch
+            ])
+            session.commit()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    def _read(self, channel: str, since: Optional[int], before: Optional[int], limit: int) -> List[Dict]:
+        query = select(ChatMessage.channel, ChatMessage.seq, ChatMessage.text, ChatMessage.sent_at)
+        query = query.where(ChatMessage.channel == channel)
+        if since is not None:
+            query = query.where(ChatMessage.seq > since).order_by(ChatMessage.seq)
+        else:
+            if before is not None:
+                query = query.where(ChatMessage.seq < before)
+            query = query.order_by(ChatMessage.seq.desc())
+        with self.session_factory() as session:
+            rows = session.execute(query.limit(limit)).all()
+        return [
+            {"room": room, "seq": seq, "text": text, "sent_at": _utc(sent_at).isoformat()}
+            for room, seq, text, sent_at in rows
+        ]
+
+    async def history(self, channel: str, since: Optional[int] = None, before: Optional[int] = None,
+                      limit: int = 50) -> List[Dict]:
+        """
+        Up to `limit` messages in seq order: the first ones after `since`, or
+        else the last ones before `before` (the latest when neither is given).
+        """
+        # Snapshot the queue first: a batch written during the read is then seen in one of the two
+        pending = list(self._pending)
+        stored = await asyncio.to_thread(self._read, channel, since, before, limit)
+        merged = {message["seq"]: message for message in stored}
+        for message in pending:
+            seq = message["seq"]
+            if (message["room"] == channel and (since is None or seq > since)
+                    and (before is None or seq < before)):
+                merged.setdefault(seq, message_frame(message))
+        seqs = sorted(merged)
+        seqs = seqs[:limit] if since is not None else seqs[-limit:]
+        return [merged[seq] for seq in seqs]
+
+    async def last_seq(self, channel: str) -> int:
+        """Highest seq logged for a channel (0 when empty)"""
+        def read():
+            with self.session_factory() as session:
+                return session.scalar(select(func.max(ChatMessage.seq)).where(ChatMessage.channel == channel)) or 0
+        stored = await asyncio.to_thread(read)
+        return max([stored] + [m["seq"] for m in self._pending if m["room"] == channel])
+
+    # -----------------------------
+    # Retention
+    # -----------------------------
+    def prune(self) -> int:
+        """Delete messages past the age limit and beyond each channel's size limit"""
+        removed = 0
+        with self.session_factory() as session:
+            if self.retention_days:
+                cutoff = datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+                removed += session.execute(delete(ChatMessage).where(ChatMessage.sent_at < cutoff)).rowcount
+            if self.max_per_channel:
+                latest = session.execute(
+                    select(ChatMessage.channel, func.max(ChatMessage.seq)).group_by(ChatMessage.channel)
+                ).all()
+                for channel, max_seq in latest:
+                    if max_seq > self.max_per_channel:
+                        removed += session.execute(
+                            delete(ChatMessage).where(ChatMessage.channel == channel,
+                                                      ChatMessage.seq <= max_seq - self.max_per_channel)
+                        ).rowcount
+            session.commit()
+        return removed
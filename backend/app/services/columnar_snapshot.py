@@ -0,0 +1,134 @@
+import json
+import os
+import struct
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# File layout: MAGIC, u64 header length, JSON header, then one 64-byte aligned
+# buffer per column (plus a null mask for strings). Numeric, boolean and
+# datetime columns are used straight from the memory map, so every worker
+# reading the same file shares one copy in the page cache.
+MAGIC = b"TCARECOL"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _encode_column(series: pd.Series) -> Tuple[Dict, List[np.ndarray]]:
+    """Column -> (header entry, buffers)"""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = dtype.categories.tolist()
+        return ({"kind": "category", "categories": categories, "ordered": bool(dtype.ordered)},
+                [np.ascontiguousarray(series.cat.codes.to_numpy())])
+    if dtype.kind in "biufM" and not isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        return {"kind": "numeric"}, [np.ascontiguousarray(series.to_numpy())]
+
+    values = series.to_numpy(dtype=object)
+    missing = pd.isna(values)
+    present = values[~missing]
+    if len(present) and all(isinstance(v, (bool, np.bool_)) for v in present):
+        # Object column holding booleans and NaN (read_csv's "true"/empty)
+        encoded = np.full(len(values), -1, dtype=np.int8)
+        encoded[~missing] = present.astype(bool)
+        return {"kind": "object_bool", "dtype": str(dtype)}, [encoded]
+    if not all(isinstance(v, str) for v in present):
+        raise TypeError(f"Column {series.name!r} holds values the columnar snapshot cannot store")
+    strings = np.where(missing, "", values).astype(str)
+    return {"kind": "string", "dtype": str(dtype)}, [strings, missing.astype(np.bool_)]
+
+
+def write_snapshot(frame: pd.DataFrame, path: str, metadata: Optional[Dict] = None):
+    """Write frame to path atomically (temp file + rename; open readers keep the old mapping)"""
+    columns, buffers = [], []
+    offset = 0
+    for name in frame.columns:
+        entry, arrays = _encode_column(frame[name])
+        entry["name"] = name
+        entry["buffers"] = []
+        for array in arrays:
+            entry["buffers"].append({"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)})
+            buffers.append((offset, array))
+            offset = _aligned(offset + array.nbytes)
+        columns.append(entry)
+
+    header = json.dumps({
+        "format": FORMAT_VERSION,
+        "pandas": pd.__version__,
+        "rows": len(frame),
+        "metadata": metadata or {},
+        "columns": columns,
+    }).encode("utf-8")
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+            for buffer_offset, array in buffers:
+                f.seek(data_start + buffer_offset)
+                f.write(array.tobytes())
+            f.truncate(data_start + offset)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_header(path: str) -> Optional[Dict]:
+    """Header of a snapshot file, or None when the file is missing or not a snapshot"""
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            (length,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(length))
+    except (OSError, ValueError, struct.error):
+        return None
+    header["data_start"] = _aligned(len(MAGIC) + 8 + length)
+    return header
+
+
+def _decode_column(entry: Dict, arrays: List[np.ndarray]) -> pd.Series:
+    kind = entry["kind"]
+    if kind == "numeric":
+        return pd.Series(arrays[0], copy=False)
+    if kind == "category":
+        dtype = pd.CategoricalDtype(entry["categories"], ordered=entry["ordered"])
+        return pd.Series(pd.Categorical.from_codes(arrays[0], dtype=dtype))
+    if kind == "object_bool":
+        codes = arrays[0]
+        values = np.full(len(codes), np.nan, dtype=object)
+        values[codes == 1] = True
+        values[codes == 0] = False
+        return pd.Series(values, dtype=entry["dtype"])
+    strings, missing = arrays
+    values = strings.astype(object)
+    values[missing] = np.nan
+    return pd.Series(values, dtype=entry["dtype"])
+
+
+def read_snapshot(path: str, header: Optional[Dict] = None) -> Optional[pd.DataFrame]:
+    """
+    Memory-map a snapshot written by write_snapshot. Returns None when the file
+    is missing, malformed or was written by another pandas / format version.
+    """
+    header = header or read_header(path)
+    if header is None or header.get("format") != FORMAT_VERSION or header.get("pandas") != pd.__version__:
+        return None
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    start = header["data_start"]
+    columns = {}
+    for entry in header["columns"]:
+        arrays = []
+        for buffer in entry["buffers"]:
+            dtype = np.dtype(buffer["dtype"])
+            count = int(np.prod(buffer["shape"]))
+            begin = start + buffer["offset"]
+            arrays.append(np.asarray(raw[begin:begin + count * dtype.itemsize]).view(dtype).reshape(buffer["shape"]))
+        columns[entry["name"]] = _decode_column(entry, arrays)
+    return pd.DataFrame(columns, copy=False)
@@ -1,5 +1,241 @@
 import csv
+import enum
+import hashlib
+import logging
 import os
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Set
+
+from sqlalchemy import and_, delete, literal, or_, select
+from sqlalchemy.orm import Session, aliased
+
+from ..config import settings
+from ..models.bridge_relationship import BridgeRelationship
+from ..models.donation_history import DonationHistory
+from ..models.emergency_profile import EmergencyProfile
+from ..models.gamification import GamificationProfile
+from ..models.user import User, UserRole
+from .blood_compatibility import normalize_blood_group, parse_blood_group
+from .donor_store import export_columnar_snapshot, resolve_csv_path
+from .leaderboard_service import LeaderboardService
+from .match_cache import invalidate_on_commit
+
+logger = logging.getLogger(__name__)
+
+# Registry roles -> UserRole
+ROLE_MAP = {
+    "emergency donor": UserRole.DONOR,
+    "bridge donor": UserRole.DONOR,
+    "donor": UserRole.DONOR,
+    "patient": UserRole.PATIENT,
+    "volunteer": UserRole.VOLUNTEER,
+    "guest": UserRole.GUEST,
+    "admin": UserRole.ADMIN,
+}
+
+DATE_FIELDS = (
+    "last_transfusion_date", "expected_next_transfusion_date", "registration_date",
+    "last_contacted_date", "last_donation_date", "next_eligible_date", "last_bridge_donation_date",
+)
+FLOAT_FIELDS = ("latitude", "longitude", "quantity_required", "donations_till_date", "calls_to_donations_ratio")
+INT_FIELDS = ("cycle_of_donations", "total_calls", "frequency_in_days")
+BOOL_FIELDS = ("role_status", "bridge_status", "status_of_bridge")
+TEXT_FIELDS = (
+    "gender", "bridge_gender", "donor_type", "eligibility_status", "status",
+    "donated_earlier", "user_donation_active_status", "inactive_trigger_comment",
+)
+
+# Registry columns, in fingerprint order
+RECORD_COLUMNS = (
+    ("user_id", "bridge_id", "role", "blood_group", "bridge_blood_group")
+    + DATE_FIELDS + FLOAT_FIELDS + INT_FIELDS + BOOL_FIELDS + TEXT_FIELDS
+)
+# Columns written on every upsert; created_at is left to the server default
+USER_COLUMNS = RECORD_COLUMNS + ("row_fingerprint",)
+
+_HEX_ID = re.compile(r"^(?:\\x|0x)?([0-9a-fA-F]+)$")
+
+
+class RowRejected(ValueError):
+    """A CSV row that cannot be imported; the message is the rejection reason"""
+
+
+@dataclass
+class ImportStats:
+    rows_read: int = 0
+    rows_upserted: int = 0
+    duplicates_in_batch: int = 0
+    unknown_blood_groups: int = 0
+    bridge_relationships_created: int = 0
+    batches: int = 0
+    rejected: Counter = field(default_factory=Counter)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows_read / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            "rows_read": self.rows_read,
+            "rows_upserted": self.rows_upserted,
+            "rows_rejected": sum(self.rejected.values()),
+            "rejected": dict(self.rejected),
+            "duplicates_in_batch": self.duplicates_in_batch,
+            "unknown_blood_groups": self.unknown_blood_groups,
+            "bridge_relationships_created": self.bridge_relationships_created,
+            "batches": self.batches,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "rows_per_sec": round(self.rows_per_sec, 1),
+        }
+
+
+@dataclass
+class ChangeSet:
+    """
+    Outcome of a delta import. records holds the normalized values of inserted
+    and updated users, so caches can patch themselves instead of reloading.
+    """
+    inserted: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    # Gone from the registry but still referenced by history/profile rows, so kept
+    retained: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    records: Dict[str, Dict] = field(default_factory=dict)
+    stats: ImportStats = field(default_factory=ImportStats)
+
+    @property
+    def changed_ids(self) -> Set[str]:
+        return set(self.inserted) | set(self.updated) | set(self.deleted)
+
+    def __bool__(self) -> bool:
+        return bool(self.inserted or self.updated or self.deleted)
+
+    def as_dict(self) -> Dict:
+        return {
+            "inserted": len(self.inserted),
+            "updated": len(self.updated),
+            "deleted": len(self.deleted),
+            "retained": len(self.retained),
+            "unchanged": self.unchanged,
+            **self.stats.as_dict(),
+        }
+
+
+def _fingerprint_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, enum.Enum):
+        return str(value.value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def row_fingerprint(values: Dict) -> str:
+    """Stable 128-bit hash of a normalized record (hex)"""
+    payload = "\x1f".join(_fingerprint_value(values.get(name)) for name in RECORD_COLUMNS)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def normalize_user_id(value: Optional[str]) -> Optional[str]:
+    """Registry ids are hex digests written "\\x<hex>"; "0x"/bare hex and any case map to that form"""
+    value = (value or "").strip()
+    if not value:
+        return None
+    match = _HEX_ID.match(value)
+    if not match:
+        raise RowRejected("invalid_user_id")
+    return "\\x" + match.group(1).lower()
+
+
+def _text(value: Optional[str]) -> Optional[str]:
+    value = (value or "").strip()
+    return value or None
+
+
+def _date(value: Optional[str]) -> Optional[date]:
+    """ISO date or timestamp ("2020-04-18 10:27:00.000") -> date"""
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        raise RowRejected("invalid_date") from None
+
+
+def _number(value: Optional[str], cast):
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return cast(float(value)) if cast is int else cast(value)
+    except ValueError:
+        raise RowRejected("invalid_number") from None
+
+
+def _bool(value: Optional[str]) -> Optional[bool]:
+    value = (value or "").strip().lower()
+    if not value:
+        return None
+    if value in ("true", "t", "1", "yes"):
+        return True
+    if value in ("false", "f", "0", "no"):
+        return False
+    raise RowRejected("invalid_boolean")
+
+
+def normalize_row(row: Dict[str, str]) -> Dict:
+    """One CSV row -> users column values; raises RowRejected"""
+    user_id = normalize_user_id(row.get("user_id"))
+    if user_id is None:
+        raise RowRejected("missing_user_id")
+    role = ROLE_MAP.get((row.get("role") or "").strip().lower())
+    if role is None:
+        raise RowRejected("unknown_role")
+
+    values = {
+        "user_id": user_id,
+        "bridge_id": normalize_user_id(row.get("bridge_id")),
+        "role": role,
+        "blood_group": parse_blood_group(row.get("blood_group")),
+        "bridge_blood_group": _text(normalize_blood_group(row.get("bridge_blood_group"))),
+    }
+    for name in DATE_FIELDS:
+        values[name] = _date(row.get(name))
+    for name in FLOAT_FIELDS:
+        values[name] = _number(row.get(name), float)
+    for name in INT_FIELDS:
+        values[name] = _number(row.get(name), int)
+    for name in BOOL_FIELDS:
+        values[name] = _bool(row.get(name))
+    for name in TEXT_FIELDS:
+        values[name] = _text(row.get(name))
+
+    lat, lon = values["latitude"], values["longitude"]
+    if (lat is not None and not -90 <= lat <= 90) or (lon is not None and not -180 <= lon <= 180):
+        raise RowRejected("invalid_coordinates")
+    values["row_fingerprint"] = row_fingerprint(values)
+    return values
+
+
+def _insert_for(session: Session):
+    """Dialect INSERT supporting ON CONFLICT (SQLite and PostgreSQL share the API)"""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upsert import is not supported on {dialect}")
+    return insert
+
 
 class DataImportService:
     def __init__(self, csv_path: str):
@@ -19,6 +255,180 @@ class DataImportService:
         print(f"Loaded {len(self.data)} records from {self.csv_path}")
         return self.data
 
+    @staticmethod
+    def iter_batches(csv_path: str, batch_size: int, stats: ImportStats,
+                     rejected_ids: Optional[Set[Optional[str]]] = None) -> Iterator[List[Dict]]:
+        """
+        Stream normalized rows in batches of distinct user ids (the registry repeats
+        some ids; the last row wins, as in the donor store). Rejected rows are
+        counted per reason and skipped; their user ids are added to rejected_ids
+        (None for a row whose user id is missing or unreadable).
+        """
+        with open(csv_path, newline="", encoding="utf-8") as csvfile:
+            batch: Dict[str, Dict] = {}
+            for row in csv.DictReader(csvfile):
+                stats.rows_read += 1
+                try:
+                    values = normalize_row(row)
+                except RowRejected as rejected:
+                    stats.rejected[str(rejected)] += 1
+                    if rejected_ids is not None:
+                        try:
+                            user_id = normalize_user_id(row.get("user_id"))
+                        except RowRejected:
+                            user_id = None
+                        rejected_ids.add(user_id)
+                    continue
+                if values["blood_group"] is None and (row.get("blood_group") or "").strip():
+                    stats.unknown_blood_groups += 1
+                if values["user_id"] in batch:
+                    stats.duplicates_in_batch += 1
+                    del batch[values["user_id"]]
+                batch[values["user_id"]] = values
+                if len(batch) >= batch_size:
+                    yield list(batch.values())
+                    batch = {}
+            if batch:
+                yield list(batch.values())
+
+    @staticmethod
+    def _upsert_statement(insert):
+        users = User.__table__
+        stmt = insert(users)
+        return stmt.on_conflict_do_update(
+            index_elements=[users.c.user_id],
+            set_={name: stmt.excluded[name] for name in USER_COLUMNS if name != "user_id"},
+        )
+
+    @classmethod
+    def import_from_csv(cls, db: Session, csv_path: Optional[str] = None,
+                        batch_size: Optional[int] = None) -> ImportStats:
+        """
+        Upsert the registry CSV into users, then derive bridge_relationships.
+        The file is streamed, and each batch is one executemany INSERT ... ON CONFLICT
+        DO UPDATE. Everything commits as one transaction.
+        """
+        path = resolve_csv_path(csv_path)
+        batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        stats = ImportStats()
+        started = time.perf_counter()
+
+        insert = _insert_for(db)
+        upsert = cls._upsert_statement(insert)
+        for batch in cls.iter_batches(path, batch_size, stats):
+            db.execute(upsert, batch)
+            stats.rows_upserted += len(batch)
+            stats.batches += 1
+
+        stats.bridge_relationships_created = cls.link_bridges(db, insert)
+        LeaderboardService.sync_profile_attributes(db)
+        invalidate_on_commit(db)
+        db.commit()
+        cls.export_snapshot(path)
+        stats.elapsed_seconds = time.perf_counter() - started
+        return stats
+
+    @classmethod
+    def import_delta(cls, db: Session, csv_path: Optional[str] = None, batch_size: Optional[int] = None,
+                     delete_missing: bool = True) -> ChangeSet:
+        """
+        Apply only what changed since the last import. Stored row fingerprints
+        are compared with the CSV's; new and changed rows are upserted, and users
+        missing from the CSV are deleted when delete_missing is set. A user whose
+        row was rejected is not missing: its stored row is left as is, and no
+        user is deleted when a rejected row has no readable id. Returns a
+        ChangeSet for cache consumers.
+        """
+        path = resolve_csv_path(csv_path)
+        batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        changes = ChangeSet()
+        stats = changes.stats
+        started = time.perf_counter()
+
+        stored = dict(db.execute(select(User.user_id, User.row_fingerprint)).all())
+        # Latest fingerprint per id in this CSV; an id repeated across batches keeps its last row
+        current: Dict[str, str] = {}
+        rejected_ids: Set[Optional[str]] = set()
+        insert = _insert_for(db)
+        upsert = cls._upsert_statement(insert)
+        for batch in cls.iter_batches(path, batch_size, stats, rejected_ids):
+            changed = []
+            for values in batch:
+                user_id, fingerprint = values["user_id"], values["row_fingerprint"]
+                previous = current.get(user_id, stored.get(user_id))
+                current[user_id] = fingerprint
+                if previous == fingerprint:
+                    continue
+                if user_id not in changes.records:
+                    (changes.updated if user_id in stored else changes.inserted).append(user_id)
+                changes.records[user_id] = values
+                changed.append(values)
+            if changed:
+                db.execute(upsert, changed)
+                stats.rows_upserted += len(changed)
+            stats.batches += 1
+        changes.unchanged = len(current) - len(changes.records)
+
+        if delete_missing and None in rejected_ids:
+            logger.warning("Delta import: rows without a readable user_id were rejected; skipping deletes")
+        elif delete_missing:
+            missing = [user_id for user_id in stored if user_id not in current and user_id not in rejected_ids]
+            if missing:
+                changes.deleted, changes.retained = cls._delete_users(db, missing)
+        if changes:
+            stats.bridge_relationships_created = cls.link_bridges(db, insert)
+        LeaderboardService.sync_profile_attributes(db)
+        invalidate_on_commit(db)
+        db.commit()
+        cls.export_snapshot(path)
+        stats.elapsed_seconds = time.perf_counter() - started
+        return changes
+
+    @staticmethod
+    def export_snapshot(csv_path: str):
+        """Columnar snapshot for the in-memory donor store, so workers mmap instead of parsing"""
+        if settings.DONOR_COLUMNAR_SNAPSHOT:
+            logger.info(f"Columnar snapshot: {export_columnar_snapshot(csv_path)}")
+
+    @staticmethod
+    def _delete_users(db: Session, user_ids: List[str]):
+        """
+        Delete users and their bridge links. Users still referenced by donation
+        history or profiles are kept. Returns (deleted, retained).
+        """
+        referenced: Set[str] = set()
+        for column in (DonationHistory.donor_id, DonationHistory.patient_id,
+                       EmergencyProfile.user_id, GamificationProfile.user_id):
+            referenced.update(db.scalars(select(column).where(column.in_(user_ids))))
+        deleted = [user_id for user_id in user_ids if user_id not in referenced]
+        if deleted:
+            db.execute(delete(BridgeRelationship).where(or_(
+                BridgeRelationship.patient_id.in_(deleted), BridgeRelationship.donor_id.in_(deleted)
+            )))
+            db.execute(delete(User).where(User.user_id.in_(deleted)))
+        return deleted, [user_id for user_id in user_ids if user_id in referenced]
+
+    @staticmethod
+    def link_bridges(db: Session, insert) -> int:
+        """
+        Every patient is linked to the donors sharing its bridge_id, in one
+        INSERT ... SELECT; existing pairs are left untouched.
+        """
+        patient, donor = aliased(User), aliased(User)
+        pairs = (
+            select(
+                patient.user_id, donor.user_id, patient.bridge_id,
+                literal(True), patient.frequency_in_days,
+            )
+            .join(donor, and_(donor.bridge_id == patient.bridge_id, donor.user_id != patient.user_id))
+            .where(patient.role == UserRole.PATIENT, donor.role == UserRole.DONOR, patient.bridge_id.isnot(None))
+        )
+        bridges = BridgeRelationship.__table__
+        stmt = insert(bridges).from_select(
+            ["patient_id", "donor_id", "bridge_id", "is_active", "frequency_days"], pairs
+        ).on_conflict_do_nothing(index_elements=["patient_id", "donor_id"])
+        return max(db.execute(stmt).rowcount, 0)
+
 
 if __name__ == "__main__":
     # CSV inside /data/ folder
@@ -0,0 +1,84 @@
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+from ..models.user import User
+from ..config import settings
+from .blood_compatibility import BLOOD_GROUP_CODES, donor_compatible_mask
+
+
+def donor_columns(donors: List[User], distances_km: Iterable[float], today: Optional[date] = None) -> Dict[str, np.ndarray]:
+    """
+    Build the columnar inputs of score_donors from ORM donor rows.
+    Missing values become NaN so they fail every threshold, like the scalar checks.
+    """
+    today = today or date.today()
+    n = len(donors)
+    days_until_eligible = np.full(n, np.nan)
+    for i, donor in enumerate(donors):
+        if donor.next_eligible_date:
+            days_until_eligible[i] = (donor.next_eligible_date - today).days
+
+    return {
+        "distance_km": np.fromiter(distances_km, dtype=np.float64, count=n),
+        "eligible": np.fromiter((d.eligibility_status == "eligible" for d in donors), dtype=bool, count=n),
+        "days_until_eligible": days_until_eligible,
+        "donations": np.array([d.donations_till_date for d in donors], dtype=np.float64),
+        "calls_ratio": np.array([d.calls_to_donations_ratio for d in donors], dtype=np.float64),
+        "blood_group_code": np.fromiter((BLOOD_GROUP_CODES.get(d.blood_group, -1) for d in donors), dtype=np.int8, count=n),
+    }
+
+
+def score_donors(
+    distance_km: np.ndarray,
+    eligible: np.ndarray,
+    days_until_eligible: np.ndarray,
+    donations: np.ndarray,
+    calls_ratio: np.ndarray,
+    blood_group_code: np.ndarray,
+    patient_code: int,
+) -> np.ndarray:
+    """
+    Vectorized BloodMatchingService.calculate_donor_score.
+    Applies the same thresholds and adds the weighted components in the same
+    order, so every element equals the scalar result bit for bit.
+    """
+    # 1. Blood compatibility
+    compatible = donor_compatible_mask(blood_group_code, patient_code)
+    compatibility = np.where(blood_group_code == patient_code, 1.0, 0.8)
+
+    # 2. Distance
+    distance = np.where(distance_km <= settings.MAX_DISTANCE_KM, 1.0 - (distance_km / settings.MAX_DISTANCE_KM), 0.0)
+
+    # 3. Availability
+    availability = np.where(eligible, 1.0, np.where(days_until_eligible <= 7, 0.5, 0.0))
+
+    # 4. Engagement
+    engagement = np.select([donations >= 10, donations >= 5, donations >= 1], [1.0, 0.7, 0.5], 0.0)
+    responsive = (calls_ratio > 0) & (calls_ratio <= 2)
+    engagement = np.where(responsive, np.minimum(engagement + 0.3, 1.0), engagement)
+
+    score = compatibility * settings.COMPATIBILITY_WEIGHT
+    score = score + distance * settings.DISTANCE_WEIGHT
+    score = score + availability * settings.AVAILABILITY_WEIGHT
+    score = score + engagement * settings.ENGAGEMENT_WEIGHT
+    return np.where(compatible, score, 0.0)
+
+
+def top_k_indices(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k largest values, in descending order.
+    Ties keep their input order, matching a stable sort(reverse=True).
+    """
+    n = len(values)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        # argpartition finds the k-th largest value; every tie with it stays a
+        # candidate so the stable sort below picks the same ones as a full sort.
+        kth = values[np.argpartition(-values, k - 1)[k - 1]]
+        candidates = np.flatnonzero(values >= kth)
+    else:
+        candidates = np.arange(n)
+    order = np.argsort(-values[candidates], kind="stable")
+    return candidates[order][:k]
@@ -0,0 +1,216 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+import pandas as pd
+
+from ..config import settings
+from .blood_compatibility import normalize_blood_group_series
+from .columnar_snapshot import read_header, read_snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+DATE_COLUMNS = [
+    "last_transfusion_date", "expected_next_transfusion_date", "registration_date",
+    "last_contacted_date", "last_donation_date", "next_eligible_date", "last_bridge_donation_date",
+]
+CATEGORY_COLUMNS = [
+    "role", "eligibility_status", "donor_type", "gender", "bridge_gender",
+    "status", "user_donation_active_status",
+]
+COLUMN_DTYPES = {
+    "user_id": str,
+    "bridge_id": str,
+    "latitude": "float32",
+    "longitude": "float32",
+    **{column: "category" for column in CATEGORY_COLUMNS},
+}
+
+
+@dataclass(frozen=True)
+class DonorSnapshot:
+    """An immutable, fully loaded donor frame plus the file state it was built from"""
+    path: str
+    frame: pd.DataFrame
+    version: int
+    source_state: Tuple[int, int]  # (mtime_ns, size)
+    loaded_at: float
+
+
+# Current snapshot per resolved CSV path, shared by every service in the process.
+# A reload builds a new snapshot off to the side and replaces the dict entry in
+# one assignment, so readers never block and never see a partial frame.
+_snapshots: Dict[str, DonorSnapshot] = {}
+_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_subscribers: List[Callable[[DonorSnapshot], None]] = []
+
+
+def resolve_csv_path(csv_path: Optional[str] = None) -> str:
+    """Absolute CSV path; relative paths (like the settings default) are taken from the backend directory"""
+    path = csv_path or settings.CSV_FILE_PATH
+    if not os.path.isabs(path):
+        path = os.path.join(BACKEND_DIR, path)
+    return os.path.normpath(path)
+
+
+def load_donor_frame(csv_path: str) -> pd.DataFrame:
+    """Parse the registry CSV into typed columns"""
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"CSV not found at {csv_path}")
+    df = pd.read_csv(csv_path, dtype=COLUMN_DTYPES)
+
+    # Canonical blood groups ("A Positive" -> "A+"), missing stays missing
+    for column in ("blood_group", "bridge_blood_group"):
+        raw = df[column]
+        df[column] = normalize_blood_group_series(raw).where(raw.notna()).astype("category")
+
+    for column in DATE_COLUMNS:
+        df[column] = pd.to_datetime(df[column], errors="coerce", format="ISO8601")
+    return df
+
+
+def _source_state(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def columnar_path(csv_path: str) -> str:
+    return csv_path + ".columns"
+
+
+def _read_columnar(path: str, state: Tuple[int, int]) -> Optional[pd.DataFrame]:
+    """The memory-mapped frame, if a snapshot of exactly this CSV state exists"""
+    header = read_header(columnar_path(path))
+    if header is None or header.get("metadata", {}).get("source_state") != list(state):
+        return None
+    return read_snapshot(columnar_path(path), header)
+
+
+def _write_columnar(path: str, frame: pd.DataFrame, state: Tuple[int, int]):
+    try:
+        write_snapshot(frame, columnar_path(path), metadata={"source": os.path.basename(path), "source_state": list(state)})
+    except (OSError, TypeError) as e:
+        # Optional: the CSV stays the source of truth
+        logger.warning(f"Donor store: could not write columnar snapshot for {path}: {e}")
+
+
+def _load_frame(path: str, state: Tuple[int, int]) -> pd.DataFrame:
+    if not settings.DONOR_COLUMNAR_SNAPSHOT:
+        return load_donor_frame(path)
+    frame = _read_columnar(path, state)
+    if frame is None:
+        frame = load_donor_frame(path)
+        _write_columnar(path, frame, state)
+    return frame
+
+
+def export_columnar_snapshot(csv_path: Optional[str] = None) -> str:
+    """Write (or refresh) the columnar snapshot of a CSV; returns its path"""
+    path = resolve_csv_path(csv_path)
+    state = _source_state(path)
+    if _read_columnar(path, state) is None:
+        _write_columnar(path, load_donor_frame(path), state)
+    return columnar_path(path)
+
+
+def _build_snapshot(path: str, version: int) -> DonorSnapshot:
+    # Stat before parsing: a write racing the parse shows up as a change next poll
+    state = _source_state(path)
+    return DonorSnapshot(path, _load_frame(path, state), version, state, time.time())
+
+
+def get_snapshot(csv_path: Optional[str] = None) -> DonorSnapshot:
+    """The current snapshot for csv_path, parsed on first use"""
+    path = resolve_csv_path(csv_path)
+    snapshot = _snapshots.get(path)
+    if snapshot is None:
+        with _lock:
+            snapshot = _snapshots.get(path)
+            if snapshot is None:
+                snapshot = _snapshots[path] = _build_snapshot(path, 1)
+    return snapshot
+
+
+def get_donor_frame(csv_path: Optional[str] = None) -> pd.DataFrame:
+    """
+    The process-wide donor frame for csv_path, parsed on first use.
+    The frame is shared: treat it as read-only and .copy() before modifying.
+    Hold on to one frame per request; a reload may swap in a new one at any time.
+    """
+    return get_snapshot(csv_path).frame
+
+
+def subscribe(callback: Callable[[DonorSnapshot], None]) -> Callable[[], None]:
+    """
+    Call callback(snapshot) after every swap, for caches derived from the frame.
+    Returns a function that removes the subscription.
+    """
+    with _lock:
+        _subscribers.append(callback)
+
+    def unsubscribe():
+        with _lock:
+            if callback in _subscribers:
+                _subscribers.remove(callback)
+    return unsubscribe
+
+
+def reload_donor_frame(csv_path: Optional[str] = None, force: bool = False) -> Optional[DonorSnapshot]:
+    """
+    Rebuild the snapshot if the CSV changed since it was loaded (or when forced)
+    and swap it in. Returns the new snapshot, or None when nothing changed.
+    Paths that were never loaded are left alone.
+    """
+    path = resolve_csv_path(csv_path)
+    with _reload_lock:
+        current = _snapshots.get(path)
+        if current is None:
+            return None
+        if not force and _source_state(path) == current.source_state:
+            return None
+        snapshot = _build_snapshot(path, current.version + 1)
+        with _lock:
+            _snapshots[path] = snapshot
+            subscribers = list(_subscribers)
+
+    logger.info(f"Donor store: reloaded {path} (version {snapshot.version}, {len(snapshot.frame)} rows)")
+    for callback in subscribers:
+        try:
+            callback(snapshot)
+        except Exception as e:
+            logger.error(f"Donor store: reload subscriber {callback!r} failed: {e}")
+    return snapshot
+
+
+class DonorStoreWatcher:
+    """Background thread polling loaded CSVs for changes and reloading them"""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None and self.interval_seconds > 0:
+            self._thread = threading.Thread(target=self._run, name="donor-store-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_seconds + 1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            for path in list(_snapshots):
+                try:
+                    reload_donor_frame(path)
+                except Exception as e:
+                    # Keep serving the previous snapshot; retry next poll
+                    logger.error(f"Donor store: reload of {path} failed: {e}")
@@ -1,38 +1,35 @@
-import qrcode
 import io
+import json
+import threading
 import pandas as pd
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse
-from typing import Optional
-import os
+from fastapi import FastAPI, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 from math import radians, sin, cos, sqrt, atan2
+from .blood_compatibility import normalize_blood_group
+from .donor_store import get_donor_frame, resolve_csv_path, subscribe
+from .nearby_donors import NearbyDonorIndex
+from .qr_cache import qr_cache, etag_for, etag_matches, not_modified, png_response
+from .qr_bulk import stream_qr_zip
+from ..config import settings
 
-# Path to CSV database
-CSV_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "hackathon_data.csv")
-
-# Load CSV
 def load_donors():
-    if not os.path.exists(CSV_PATH):
-        raise FileNotFoundError(f"CSV not found at {CSV_PATH}")
-    df = pd.read_csv(CSV_PATH)
-    # Normalize blood group
-    df["blood_group"] = df["blood_group"].str.upper()
-    df["user_id"] = df["user_id"].astype(str)
-    return df
+    """Shared donor frame (blood groups normalized, coordinates and dates typed)"""
+    return get_donor_frame()
 
 donors_df = load_donors()
 app = FastAPI(title="Emergency QR Profile System")
 
+# Render parameters of the emergency badge QR
+EMERGENCY_QR_PARAMS = {"version": 1, "box_size": 8, "border": 4}
+
+def profile_url(user_id: str) -> str:
+    return f"https://tcare.app/emergency_profile/{user_id}"
+
 def generate_qr_code(data: str):
     """Generates a QR code image as PNG bytes"""
-    qr = qrcode.QRCode(version=1, box_size=8, border=4)
-    qr.add_data(data)
-    qr.make(fit=True)
-    img = qr.make_image(fill="black", back_color="white")
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    buf.seek(0)
-    return buf
+    return io.BytesIO(qr_cache.render(data, **EMERGENCY_QR_PARAMS).png)
 
 def haversine(lat1, lon1, lat2, lon2):
     """Distance in km between two lat/lon points"""
@@ -43,34 +40,164 @@ def haversine(lat1, lon1, lat2, lon2):
     c = 2*atan2(sqrt(a), sqrt(1-a))
     return R * c
 
+def _public_value(value, default):
+    """JSON-safe profile field: missing -> default, timestamps -> ISO date"""
+    if value is None or pd.isna(value):
+        return default
+    if isinstance(value, pd.Timestamp):
+        return value.date().isoformat()
+    return value
+
 def get_nearby_emergency_donors(blood_group: str, lat: float, lon: float, top_n: int = 5):
-    df = donors_df[(donors_df["blood_group"] == blood_group.upper()) &
-                   (donors_df["eligibility_status"].astype(str).str.lower() == "eligible")]
-    nearby = []
-    for _, row in df.iterrows():
-        if pd.isna(row["latitude"]) or pd.isna(row["longitude"]):
-            continue
-        distance = haversine(lat, lon, row["latitude"], row["longitude"])
-        nearby.append({
-            "user_id": row["user_id"],
-            "blood_group": row["blood_group"],
-            "distance_km": round(distance, 2),
-            "gender": row.get("gender", "Unknown")
-        })
-    nearby_sorted = sorted(nearby, key=lambda x: x["distance_km"])
-    return nearby_sorted[:top_n]
+    """Nearest eligible donors of the blood group, from the grid index of the current directory"""
+    return get_directory().nearby.query(normalize_blood_group(blood_group), lat, lon, top_n)
+
+# Public profile fields and their placeholder when missing (or not in the registry)
+PROFILE_FIELDS = {
+    "blood_group": "Unknown",
+    "allergies": "None",
+    "last_transfusion_date": "Unknown",
+    "emergency_contacts": "Unknown",
+    "gender": "Unknown",
+    "age": "Unknown",
+}
+
+def _dumps(content) -> bytes:
+    """Same encoding as JSONResponse"""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+class EmergencyDirectory:
+    """
+    Lookup tables for the public QR endpoints, built once per donor frame:
+    user_id -> row position, and each user's profile serialized ahead of time.
+    Full profile responses (with nearby donors) are cached on first scan.
+    """
+
+    def __init__(self, donors: pd.DataFrame, previous: Optional["EmergencyDirectory"] = None):
+        self.donors = donors
+        # Top-5 nearby eligible donors per profile location, warmed in the background
+        self.nearby = NearbyDonorIndex(donors, top_n=5, previous=previous.nearby if previous else None)
+        self.rows: Dict[str, int] = {}
+        for pos, user_id in enumerate(donors["user_id"]):
+            if isinstance(user_id, str):
+                self.rows.setdefault(user_id, pos)
+
+        positions = list(self.rows.values())
+        columns = {
+            name: donors[name].iloc[positions].tolist() if name in donors.columns else [None] * len(positions)
+            for name in PROFILE_FIELDS
+        }
+        # Serialized profile without its closing brace; nearby donors are appended per request
+        self.profiles: Dict[str, bytes] = {}
+        for i, user_id in enumerate(self.rows):
+            profile = {"user_id": user_id}
+            for name, default in PROFILE_FIELDS.items():
+                profile[name] = _public_value(columns[name][i], default)
+            self.profiles[user_id] = _dumps(profile)[:-1]
+        self._responses: Dict[str, bytes] = {}
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.rows
+
+    def profile_response(self, user_id: str) -> Optional[bytes]:
+        """Serialized profile with nearby emergency donors, or None for unknown users"""
+        body = self._responses.get(user_id)
+        if body is None:
+            prefix = self.profiles.get(user_id)
+            if prefix is None:
+                return None
+            donor = self.donors.iloc[self.rows[user_id]]
+            nearby = self.nearby.for_location(donor["blood_group"], donor["latitude"], donor["longitude"])
+            body = self._responses[user_id] = prefix + b',"nearby_emergency_donors":' + _dumps(nearby) + b"}"
+        return body
+
+_directory: Optional[EmergencyDirectory] = None
+_directory_lock = threading.Lock()
+
+def get_directory() -> EmergencyDirectory:
+    global _directory
+    directory = _directory
+    if directory is None:
+        with _directory_lock:
+            if _directory is None:
+                _directory = EmergencyDirectory(donors_df)
+                _directory.nearby.warm_in_background()
+            directory = _directory
+    return directory
+
+def _follow_reload(snapshot):
+    """Hot reload: the new directory is built here, then swapped in with the frame"""
+    global donors_df, _directory
+    if snapshot.path == resolve_csv_path():
+        directory = EmergencyDirectory(snapshot.frame, previous=_directory)
+        donors_df, _directory = snapshot.frame, directory
+        directory.nearby.warm_in_background()
+
+subscribe(_follow_reload)
 
 @app.get("/emergency_qr/{user_id}")
-def emergency_qr(user_id: str):
+def emergency_qr(user_id: str, if_none_match: Optional[str] = Header(None)):
     """
     Generates a QR code for a donor's emergency profile.
     QR encodes a link to their public profile.
     """
-    if user_id not in donors_df["user_id"].values:
+    if user_id not in get_directory():
         raise HTTPException(status_code=404, detail="User not found")
-    profile_url = f"https://tcare.app/emergency_profile/{user_id}"
-    img_buf = generate_qr_code(profile_url)
-    return StreamingResponse(img_buf, media_type="image/png")
+    url = profile_url(user_id)
+    key = qr_cache.key(url, **EMERGENCY_QR_PARAMS)
+    if etag_matches(etag_for(key), if_none_match):
+        return not_modified(etag_for(key))
+    return png_response(qr_cache.render(url, **EMERGENCY_QR_PARAMS))
+
+class BulkQRRequest(BaseModel):
+    """Either explicit user_ids, or filters selecting donors from the registry"""
+    user_ids: Optional[List[str]] = None
+    blood_group: Optional[str] = None
+    role: Optional[str] = None
+    eligibility_status: Optional[str] = None
+    limit: int = Field(default=1000, ge=1)
+
+def select_bulk_user_ids(request: BulkQRRequest) -> List[str]:
+    """Distinct user ids for a bulk request, in registry order"""
+    donors = donors_df
+    if request.user_ids is not None:
+        directory = get_directory()
+        missing = sorted({user_id for user_id in request.user_ids if user_id not in directory})
+        if missing:
+            raise HTTPException(status_code=404, detail={"message": "Users not found", "user_ids": missing[:20]})
+        return list(dict.fromkeys(request.user_ids))
+
+    mask = donors["user_id"].notna()
+    if request.blood_group:
+        mask &= donors["blood_group"] == normalize_blood_group(request.blood_group)
+    if request.role:
+        mask &= donors["role"].astype(str).str.lower() == request.role.lower()
+    if request.eligibility_status:
+        mask &= donors["eligibility_status"].astype(str).str.lower() == request.eligibility_status.lower()
+    return list(dict.fromkeys(donors.loc[mask, "user_id"]))[:request.limit]
+
+@app.post("/emergency_qr/bulk")
+def emergency_qr_bulk(request: BulkQRRequest):
+    """
+    ZIP of emergency QR badges (one PNG per donor plus manifest.csv) for print campaigns.
+    The archive is streamed while codes are rendered in worker processes.
+    """
+    user_ids = select_bulk_user_ids(request)
+    if not user_ids:
+        raise HTTPException(status_code=404, detail="No users match the request")
+    if len(user_ids) > settings.QR_BULK_MAX_CODES:
+        raise HTTPException(
+            status_code=413, detail=f"At most {settings.QR_BULK_MAX_CODES} codes per request"
+        )
+    items = [{"user_id": user_id, "url": profile_url(user_id)} for user_id in user_ids]
+    return StreamingResponse(
+        stream_qr_zip(items, EMERGENCY_QR_PARAMS),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": 'attachment; filename="emergency_qr_codes.zip"',
+            "X-QR-Count": str(len(items)),
+        },
+    )
 
 @app.get("/emergency_profile/{user_id}")
 def emergency_profile(user_id: str):
@@ -78,32 +205,10 @@ def emergency_profile(user_id: str):
     Returns the public emergency info for a donor.
     No login required. Includes nearby emergency donors.
     """
-    donor = donors_df[donors_df["user_id"] == user_id]
-    if donor.empty:
+    body = get_directory().profile_response(user_id)
+    if body is None:
         raise HTTPException(status_code=404, detail="User not found")
-
-    donor_info = donor.iloc[0]
-    profile = {
-        "user_id": donor_info["user_id"],
-        "blood_group": donor_info["blood_group"],
-        "allergies": donor_info.get("allergies", "None"),
-        "last_transfusion_date": donor_info.get("last_transfusion_date", "Unknown"),
-        "emergency_contacts": donor_info.get("emergency_contacts", "Unknown"),
-        "gender": donor_info.get("gender", "Unknown"),
-        "age": donor_info.get("age", "Unknown")
-    }
-
-    # Add top nearby emergency donors
-    lat = donor_info.get("latitude")
-    lon = donor_info.get("longitude")
-    if pd.notna(lat) and pd.notna(lon):
-        profile["nearby_emergency_donors"] = get_nearby_emergency_donors(
-            blood_group=donor_info["blood_group"], lat=lat, lon=lon, top_n=5
-        )
-    else:
-        profile["nearby_emergency_donors"] = []
-
-    return JSONResponse(content=profile)
+    return Response(content=body, media_type="application/json")
 
 @app.get("/emergency_nearby")
 def emergency_nearby(blood_group: str, lat: float, lon: float, top_n: int = 10):
@@ -1,11 +1,19 @@
-import os
-import pandas as pd
 from math import radians, sin, cos, sqrt, atan2
-from datetime import datetime, timedelta
+from dataclasses import replace
+from datetime import date, datetime, timedelta
+from typing import Dict, NamedTuple, Tuple
+import numpy as np
+import pandas as pd
+from .blood_compatibility import normalize_blood_group
+from .donor_store import get_donor_frame, get_snapshot, subscribe
+from .donor_scoring import top_k_indices
+from .geo_index import haversine_km
+from .transfusion_planner import TransfusionPlanner, TransfusionSlot, patient_slots
+from .schedule_ledger import ScheduleLedger
+from ..config import settings
 
-DATA_PATH = os.path.join(
-    os.path.dirname(__file__), "..", "data", "hackathon_data.csv"
-)
+# Planning passes before units still losing booking races are reported unfilled
+BOOKING_ATTEMPTS = 3
 
 def haversine(lat1, lon1, lat2, lon2):
     """Calculate distance between two lat/lon points in km"""
@@ -16,82 +24,136 @@ def haversine(lat1, lon1, lat2, lon2):
     c = 2 * atan2(sqrt(a), sqrt(1 - a))
     return R * c
 
-def normalize_blood_group(bg: str) -> str:
-    if not isinstance(bg, str):
-        return ""
-    bg = bg.strip().upper()
-    mapping = {
-        "A POSITIVE": "A+", "A+": "A+", "A NEGATIVE": "A-", "A-": "A-",
-        "B POSITIVE": "B+", "B+": "B+", "B NEGATIVE": "B-", "B-": "B-",
-        "AB POSITIVE": "AB+", "AB+": "AB+", "AB NEGATIVE": "AB-", "AB-": "AB-",
-        "O POSITIVE": "O+", "O+": "O+", "O NEGATIVE": "O-", "O-": "O-"
-    }
-    return mapping.get(bg, bg)
-
 def load_data():
-    """Load CSV and normalize blood groups"""
-    if not os.path.exists(DATA_PATH):
-        raise FileNotFoundError(f"CSV not found at {DATA_PATH}")
-    df = pd.read_csv(DATA_PATH)
-    df["blood_group"] = df["blood_group"].apply(normalize_blood_group)
-    df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce")
-    df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce")
-    df["next_eligible_date"] = pd.to_datetime(df["next_eligible_date"], errors="coerce")
-    return df
+    """Shared donor frame (blood groups normalized, coordinates and dates typed)"""
+    return get_donor_frame()
+
+class EligiblePool(NamedTuple):
+    """Eligible donors of one blood group with coordinates, plus those coordinates as float64 arrays"""
+    donors: pd.DataFrame
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+
 
 class DonorScheduler:
     def __init__(self):
-        self.df = load_data()
-        # Keep track of scheduled donors
-        self.scheduled_donors = {}  # {donor_id: list of scheduled dates}
+        self._snapshot = get_snapshot()
+        # Persistent bookings, shared across workers
+        self.ledger = ScheduleLedger()
+        # Eligible donor pool per (snapshot version, blood group), built on first use
+        self._eligible_pools: Dict[Tuple[int, str], EligiblePool] = {}
+        subscribe(self._on_reload)
+
+    @property
+    def df(self):
+        """Current donor frame (follows hot reloads)"""
+        return self._snapshot.frame
+
+    def _on_reload(self, snapshot):
+        if snapshot.path == self._snapshot.path:
+            self._snapshot = snapshot
+            self._eligible_pools = {}
+
+    def _eligible_pool(self, blood_group) -> EligiblePool:
+        snapshot, pools = self._snapshot, self._eligible_pools
+        key = (snapshot.version, blood_group)
+        pool = pools.get(key)
+        if pool is None:
+            df = snapshot.frame
+            donors = df[
+                (df["blood_group"] == blood_group) &
+                (df["eligibility_status"].str.lower() == "eligible") &
+                (df["latitude"].notna()) &
+                (df["longitude"].notna())
+            ]
+            pool = pools[key] = EligiblePool(
+                donors,
+                donors["latitude"].to_numpy(dtype=np.float64),
+                donors["longitude"].to_numpy(dtype=np.float64),
+            )
+        return pool
 
     def _eligible_donors(self, blood_group):
-        return self.df[
-            (self.df["blood_group"] == blood_group) &
-            (self.df["eligibility_status"].str.lower() == "eligible") &
-            (self.df["latitude"].notna()) &
-            (self.df["longitude"].notna())
-        ]
+        return self._eligible_pool(blood_group).donors
 
     def emergency_donors(self, patient_lat, patient_lon, blood_group, top_n=10):
         """Return top N closest donors for emergencies"""
-        donors = self._eligible_donors(blood_group)
-        donors_list = []
-        for _, row in donors.iterrows():
-            distance = haversine(patient_lat, patient_lon, row["latitude"], row["longitude"])
-            donors_list.append({
-                "user_id": row["user_id"],
-                "blood_group": row["blood_group"],
-                "distance_km": round(distance, 2),
-                "gender": row["gender"]
-            })
-        donors_sorted = sorted(donors_list, key=lambda x: x["distance_km"])
-        return donors_sorted[:top_n]
+        pool = self._eligible_pool(normalize_blood_group(blood_group))
+        if pool.donors.empty:
+            return []
+
+        distances = haversine_km(patient_lat, patient_lon, pool.latitudes, pool.longitudes)
+        # Nearest first on the rounded distance; equal distances keep registry order
+        nearest = top_k_indices(-np.round(distances, 2), top_n)
+        rows = pool.donors.iloc[nearest]
+        return [
+            {
+                "user_id": user_id,
+                "blood_group": group,
+                "distance_km": round(float(distance), 2),
+                "gender": None if pd.isna(gender) else gender
+            }
+            for user_id, group, gender, distance in zip(
+                rows["user_id"], rows["blood_group"], rows["gender"], distances[nearest]
+            )
+        ]
+
+    def _schedule(self, slots):
+        """
+        Plan slots against the ledger's bookings and persist the result.
+        Units whose donor was booked concurrently by another worker are re-planned.
+        """
+        slot_for = {(slot.patient_id, slot.transfusion_date.isoformat()): slot for slot in slots}
+        assignments, unfilled = [], []
+        donors = self.df
+        for _ in range(BOOKING_ATTEMPTS):
+            planner = TransfusionPlanner(donors)
+            gap = timedelta(days=planner.max_gap_days)
+            planner.add_bookings(self.ledger.bookings_by_donor(
+                min(slot.scheduled_date for slot in slots) - gap,
+                max(slot.scheduled_date for slot in slots) + gap + timedelta(days=1)
+            ))
+            planned, missing = planner.plan(slots)
+            booked, conflicts = self.ledger.book_many(
+                planned, {assignment["donor_id"]: planner.gap_for(assignment["donor_id"]) for assignment in planned}
+            )
+            assignments.extend(booked)
+            unfilled.extend(missing)
+            slots = [
+                replace(slot_for[(conflict["patient_id"], conflict["transfusion_date"])], units=1)
+                for conflict in conflicts
+            ]
+            if not slots:
+                break
+        unfilled.extend(TransfusionPlanner.unfilled_entry(slot) for slot in slots)
+        return assignments, unfilled
 
     def schedule_regular_transfusion(self, patient_id, patient_lat, patient_lon, blood_group, transfusion_date, units_needed=1):
         """Schedule donors a day before transfusion ensuring no overlaps"""
-        donors = self._eligible_donors(blood_group)
-        # Sort donors by distance, availability and past reliability
-        donors = donors.sort_values(by=["donations_till_date", "latitude"], ascending=[False, True])
-        
-        scheduled_date = transfusion_date - timedelta(days=1)
-        assigned = []
-        for _, row in donors.iterrows():
-            donor_id = row["user_id"]
-            # Skip if donor already scheduled on this date
-            if donor_id in self.scheduled_donors and scheduled_date in self.scheduled_donors[donor_id]:
-                continue
-            assigned.append({
-                "donor_id": donor_id,
-                "blood_group": row["blood_group"],
-                "distance_km": round(haversine(patient_lat, patient_lon, row["latitude"], row["longitude"]), 2),
-                "scheduled_date": scheduled_date.strftime("%Y-%m-%d")
-            })
-            # Update schedule
-            self.scheduled_donors.setdefault(donor_id, []).append(scheduled_date)
-            if len(assigned) >= units_needed:
-                break
-        return assigned
+        if isinstance(transfusion_date, datetime):
+            transfusion_date = transfusion_date.date()
+        slot = TransfusionSlot(
+            patient_id, normalize_blood_group(blood_group), patient_lat, patient_lon, transfusion_date, units_needed
+        )
+        assignments, _ = self._schedule([slot])
+        return [
+            {key: assignment[key] for key in ("donor_id", "blood_group", "distance_km", "scheduled_date")}
+            for assignment in assignments
+        ]
+
+    def plan_transfusions(self, start=None, horizon_days=None):
+        """Assign donors to every patient transfusion due in [start, start + horizon_days)"""
+        start = start or date.today()
+        horizon_days = horizon_days or settings.SCHEDULING_HORIZON_DAYS
+        patients = self.df[self.df["role"] == "Patient"]
+        slots = patient_slots(patients, start, horizon_days)
+        assignments, unfilled = self._schedule(slots) if slots else ([], [])
+        return {
+            "start": start.isoformat(),
+            "horizon_days": horizon_days,
+            "assignments": assignments,
+            "unfilled": unfilled,
+        }
 
 if __name__ == "__main__":
     scheduler = DonorScheduler()
@@ -110,3 +172,7 @@ if __name__ == "__main__":
         units_needed=2
     )
     print("Scheduled donors for transfusion:", schedule)
+
+    # Example weekly planning run for every patient
+    plan = scheduler.plan_transfusions()
+    print(f"Planned {len(plan['assignments'])} donations, {len(plan['unfilled'])} units unfilled")
@@ -0,0 +1,139 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# Exact-match indexes: value -> row positions
+HASH_INDEX_COLUMNS = ("user_id", "bridge_id")
+GROUP_INDEX_COLUMNS = ("blood_group", "role", "eligibility_status", "donor_type")
+
+# Filter suffixes (Django style: donations_till_date__gte=3)
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+OPERATORS = ("eq", "in") + RANGE_OPERATORS
+
+
+def parse_filter(key: str) -> Tuple[str, str]:
+    """"next_eligible_date__lte" -> ("next_eligible_date", "lte"); no suffix means equality"""
+    column, _, op = key.rpartition("__")
+    if column and op in OPERATORS:
+        return column, op
+    return key, "eq"
+
+
+class SortedIndex:
+    """Non-missing values of a numeric or datetime column in sorted order, with their row positions"""
+
+    def __init__(self, values: np.ndarray):
+        present = np.flatnonzero(~pd.isna(values))
+        order = np.argsort(values[present], kind="stable")
+        self.positions = present[order]
+        self.values = values[self.positions]
+
+    def range(self, op: str, bound) -> np.ndarray:
+        if op in ("gt", "lte"):
+            cut = np.searchsorted(self.values, bound, side="right")
+        else:
+            cut = np.searchsorted(self.values, bound, side="left")
+        hits = self.positions[cut:] if op in ("gt", "gte") else self.positions[:cut]
+        return np.sort(hits)
+
+
+class FrameIndex:
+    """
+    Secondary indexes over a read-only frame. Each filter is answered from an
+    index when one exists; filters without one are evaluated as masks on the
+    remaining candidate rows only. Results keep the frame's row order.
+    """
+
+    def __init__(self, frame: pd.DataFrame,
+                 hash_columns: Iterable[str] = HASH_INDEX_COLUMNS,
+                 group_columns: Iterable[str] = GROUP_INDEX_COLUMNS):
+        self.frame = frame
+        self.exact: Dict[str, Dict[Any, np.ndarray]] = {}
+        self.kinds: Dict[str, str] = {}
+        for kind, columns in (("hash", hash_columns), ("group", group_columns)):
+            for column in columns:
+                if column in frame.columns:
+                    groups = frame.groupby(column, sort=False, observed=True).indices
+                    self.exact[column] = {value: np.asarray(rows) for value, rows in groups.items()}
+                    self.kinds[column] = kind
+
+        self.sorted: Dict[str, SortedIndex] = {}
+        for column in frame.columns:
+            dtype = frame[column].dtype
+            if not isinstance(dtype, pd.CategoricalDtype) and dtype.kind in "iufM":
+                self.sorted[column] = SortedIndex(frame[column].to_numpy())
+                self.kinds.setdefault(column, "sorted")
+        self._unique: Dict[str, List] = {}
+
+    def unique_values(self, column: str) -> List:
+        """Distinct values in order of first appearance (cached per frame)"""
+        values = self._unique.get(column)
+        if values is None:
+            values = self._unique[column] = self.frame[column].unique().tolist()
+        return values
+
+    def _bound(self, column: str, value):
+        if self.frame[column].dtype.kind == "M":
+            return np.datetime64(pd.Timestamp(value).to_datetime64())
+        return value
+
+    def _lookup(self, column: str, op: str, value) -> Tuple[Optional[np.ndarray], str]:
+        """(row positions, index used), or (None, "scan") when no index serves the filter"""
+        if op in ("eq", "in") and column in self.exact:
+            index = self.exact[column]
+            values = [value] if op == "eq" else list(value)
+            hits = [index[v] for v in values if v in index]
+            if not hits:
+                return np.empty(0, dtype=np.intp), f"{self.kinds[column]}:{column}"
+            rows = hits[0] if len(hits) == 1 else np.unique(np.concatenate(hits))
+            return rows, f"{self.kinds[column]}:{column}"
+        if op in RANGE_OPERATORS and column in self.sorted:
+            return self.sorted[column].range(op, self._bound(column, value)), f"sorted:{column}"
+        return None, "scan"
+
+    def _mask(self, series: pd.Series, op: str, value) -> np.ndarray:
+        if op == "eq":
+            return (series == value).to_numpy(dtype=bool)
+        if op == "in":
+            return series.isin(list(value)).to_numpy(dtype=bool)
+        bound = self._bound(series.name, value)
+        compare = {"gt": series.gt, "gte": series.ge, "lt": series.lt, "lte": series.le}[op]
+        return compare(bound).to_numpy(dtype=bool)
+
+    def lookup(self, **filters) -> Tuple[np.ndarray, List[Dict]]:
+        """
+        Row positions matching every filter, plus the plan: one step per filter
+        with the index that served it (or "scan") and the rows left after it.
+        Filters on unknown columns are ignored, like CSVDatabase.query always did.
+        """
+        indexed, residual, steps = [], [], []
+        for key, value in filters.items():
+            column, op = parse_filter(key)
+            if column not in self.frame.columns:
+                steps.append({"filter": key, "column": column, "op": op, "index": "ignored"})
+                continue
+            rows, index = self._lookup(column, op, value)
+            step = {"filter": key, "column": column, "op": op, "index": index}
+            if rows is None:
+                residual.append((column, op, value, step))
+            else:
+                step["matches"] = int(len(rows))
+                indexed.append((rows, step))
+
+        # Most selective index first; intersections only shrink from there
+        positions = None
+        for rows, step in sorted(indexed, key=lambda item: len(item[0])):
+            positions = rows if positions is None else np.intersect1d(positions, rows, assume_unique=True)
+            step["rows"] = int(len(positions))
+            steps.append(step)
+        if positions is None:
+            positions = np.arange(len(self.frame))
+
+        for column, op, value, step in residual:
+            step["scanned"] = int(len(positions))
+            if len(positions):
+                candidates = self.frame[column].iloc[positions]
+                positions = positions[self._mask(candidates, op, value)]
+            step["rows"] = int(len(positions))
+            steps.append(step)
+        return positions, steps
@@ -1,49 +1,79 @@
-import os
-from backend.app.services.data_import_service import DataImportService
+from typing import Dict, Optional
+import pandas as pd
+from .donor_store import get_donor_frame
+from .skip_list import IndexableSkipList
 
 
 class GamificationService:
     def __init__(self):
-        # Path to CSV
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        csv_path = os.path.join(base_dir, "data", "hackathon_data.csv")
+        # Shared donor frame (read-only)
+        self.users = get_donor_frame()
 
-        # Import CSV
-        self.data_importer = DataImportService(csv_path)
-        self.users = self.data_importer.load_csv()
+        # Row position of each user's first CSV row, used for leaderboard details
+        self.user_rows = {}
+        for pos, user_id in enumerate(self.users["user_id"]):
+            if isinstance(user_id, str) and user_id:
+                self.user_rows.setdefault(user_id, pos)
 
         # Initialize gamification scores
-        self.scores = {}
-        for u in self.users:
-            user_id = u.get("user_id")
-            if user_id:
-                # Base score = donations + call efficiency bonus
-                donations = int(u.get("donations_till_date", 0) or 0)
-                calls_ratio = float(u.get("calls_to_donations_ratio", 0) or 0.0)
-                self.scores[user_id] = donations * 10 + int(calls_ratio * 5)
+        # Base score = donations + call efficiency bonus (last row wins for repeated ids)
+        donations = self.users["donations_till_date"].fillna(0).astype(int)
+        calls_ratio = self.users["calls_to_donations_ratio"].fillna(0.0)
+        base_scores = donations * 10 + (calls_ratio * 5).astype(int)
+        self.scores = {
+            user_id: int(score)
+            for user_id, score in zip(self.users["user_id"], base_scores)
+            if isinstance(user_id, str) and user_id
+        }
+
+        # Ranking kept in order as points change: keys are (-score, seq), so equal
+        # scores stay in first-appearance order
+        self._seq = {user_id: seq for seq, user_id in enumerate(self.scores)}
+        self.ranking = IndexableSkipList(seed=0)
+        for user_id, score in self.scores.items():
+            self.ranking.insert((-score, self._seq[user_id]), user_id)
+
+    def _key(self, user_id: str):
+        return -self.scores[user_id], self._seq[user_id]
 
     def add_points(self, user_id: str, points: int):
-        """Add gamification points to a user"""
+        """Add gamification points to a user (O(log n))"""
         if user_id in self.scores:
+            self.ranking.remove(self._key(user_id))
             self.scores[user_id] += points
+            self.ranking.insert(self._key(user_id), user_id)
         else:
             print(f"[Gamification] User {user_id} not found.")
 
-    def get_leaderboard(self, top_n: int = 5):
-        """Return top N donors sorted by score"""
-        sorted_scores = sorted(self.scores.items(), key=lambda x: x[1], reverse=True)
+    def get_rank(self, user_id: str) -> Optional[int]:
+        """1-based leaderboard position of a user, or None if unknown"""
+        if user_id not in self.scores:
+            return None
+        return self.ranking.rank(self._key(user_id)) + 1
+
+    def get_standing(self, user_id: str) -> Optional[Dict]:
+        """Rank, score and number of ranked users ("you are #312 of 6946")"""
+        rank = self.get_rank(user_id)
+        if rank is None:
+            return None
+        return {"user_id": user_id, "rank": rank, "score": self.scores[user_id], "total": len(self.ranking)}
+
+    def get_leaderboard(self, top_n: int = 5, offset: int = 0):
+        """Return top N donors sorted by score, starting after `offset` entries"""
         leaderboard = []
 
-        for user_id, score in sorted_scores[:top_n]:
-            user = next((u for u in self.users if u.get("user_id") == user_id), None)
-            if user:
-                leaderboard.append({
-                    "name": user.get("role", "Unknown"),  # could change to `role` or add a name column later
-                    "user_id": user_id,
-                    "score": score,
-                    "donations": user.get("donations_till_date", "0"),
-                    "blood_group": user.get("blood_group", "Unknown"),
-                })
+        for (neg_score, _), user_id in self.ranking.items(offset, offset + top_n):
+            score = -neg_score
+            user = self.users.iloc[self.user_rows[user_id]]
+            donations = user["donations_till_date"]
+            blood_group = user["blood_group"]
+            leaderboard.append({
+                "name": user["role"],  # could change to `role` or add a name column later
+                "user_id": user_id,
+                "score": score,
+                "donations": 0 if pd.isna(donations) else int(donations),
+                "blood_group": "Unknown" if pd.isna(blood_group) else blood_group,
+            })
         return leaderboard
 
 
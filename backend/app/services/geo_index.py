@@ -0,0 +1,134 @@
+import math
+from typing import NamedTuple, Optional
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+class BoundingBox(NamedTuple):
+    min_lat: float
+    max_lat: float
+    min_lon: float
+    max_lon: float
+
+    def contains(self, lat: float, lon: float) -> bool:
+        return self.min_lat <= lat <= self.max_lat and self.min_lon <= lon <= self.max_lon
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> BoundingBox:
+    """
+    Smallest lat/lon box that contains every point within radius_km of (lat, lon).
+    Used as a cheap, index-friendly prefilter before the exact Haversine check.
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    d_lat = math.degrees(angular)
+    min_lat, max_lat = lat - d_lat, lat + d_lat
+
+    # Near the poles (or for huge radii) every longitude is reachable
+    if max_lat >= 90 or min_lat <= -90 or angular >= math.pi / 2:
+        return BoundingBox(max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0)
+
+    d_lon = math.degrees(math.asin(math.sin(angular) / math.cos(math.radians(lat))))
+    return BoundingBox(min_lat, max_lat, lon - d_lon, lon + d_lon)
+
+
+def haversine_km(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """Distances (km) from one point to arrays of points, in a single vectorized pass"""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lons, dtype=np.float64))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_matrix_km(lats1, lons1, lats2, lons2) -> np.ndarray:
+    """Pairwise distances (km): rows are the first point set, columns the second"""
+    lat1 = np.radians(np.asarray(lats1, dtype=np.float64))[:, None]
+    lon1 = np.radians(np.asarray(lons1, dtype=np.float64))[:, None]
+    lat2 = np.radians(np.asarray(lats2, dtype=np.float64))[None, :]
+    lon2 = np.radians(np.asarray(lons2, dtype=np.float64))[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class GridIndex:
+    """
+    Uniform lat/lon grid over a fixed point set, for k-nearest-neighbour queries.
+    Cells are searched in rings around the query until no unvisited cell can
+    hold a closer point. Not dateline-aware.
+    """
+
+    # Target points per cell when the cell size is derived from the data
+    POINTS_PER_CELL = 8
+
+    def __init__(self, lats, lons, cell_deg: Optional[float] = None):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        if cell_deg is None:
+            area = 1.0
+            if len(self.lats):
+                area = max(np.ptp(self.lats), 0.01) * max(np.ptp(self.lons), 0.01)
+            cell_deg = min(max(math.sqrt(area * self.POINTS_PER_CELL / max(len(self.lats), 1)), 0.01), 10.0)
+        self.cell_deg = cell_deg
+        rows = np.floor(self.lats / cell_deg).astype(np.int64)
+        cols = np.floor(self.lons / cell_deg).astype(np.int64)
+        self.cells = {}
+        if len(rows):
+            order = np.lexsort((cols, rows))
+            keys = np.stack([rows[order], cols[order]], axis=1)
+            starts = np.flatnonzero(np.r_[True, (np.diff(keys, axis=0) != 0).any(axis=1)])
+            for start, end in zip(starts, np.r_[starts[1:], len(order)]):
+                self.cells[(int(keys[start, 0]), int(keys[start, 1]))] = np.sort(order[start:end])
+            self.extent = (int(rows.min()), int(rows.max()), int(cols.min()), int(cols.max()))
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _ring(self, row: int, col: int, r: int):
+        if r == 0:
+            yield row, col
+            return
+        for c in range(col - r, col + r + 1):
+            yield row - r, c
+            yield row + r, c
+        for rr in range(row - r + 1, row + r):
+            yield rr, col - r
+            yield rr, col + r
+
+    def _lower_bound_km(self, lat: float, r: int) -> float:
+        """Smallest possible distance to a point outside the ring-r square of cells"""
+        width = r * self.cell_deg
+        if width <= 0:
+            return 0.0
+        by_lat = EARTH_RADIUS_KM * math.radians(width)
+        cos_min = math.cos(math.radians(min(90.0, abs(lat) + width)))
+        by_lon = 2 * EARTH_RADIUS_KM * math.asin(min(1.0, cos_min * math.sin(math.radians(min(width, 180.0)) / 2)))
+        return min(by_lat, by_lon)
+
+    def nearest(self, lat: float, lon: float, k: int, decimals: int = 2):
+        """
+        (positions, distances_km) of the k nearest points, nearest first.
+        Distances are compared rounded to `decimals` (as the API reports them);
+        equal ones keep point order.
+        """
+        if not self.cells or k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        row, col = math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+        min_row, max_row, min_col, max_col = self.extent
+        last_ring = max(row - min_row, max_row - row, col - min_col, max_col - col, 0)
+        tolerance = 0.5 * 10 ** -decimals
+
+        found, distances = [], []
+        for r in range(last_ring + 1):
+            for cell in self._ring(row, col, r):
+                hits = self.cells.get(cell)
+                if hits is not None:
+                    found.append(hits)
+                    distances.append(haversine_km(lat, lon, self.lats[hits], self.lons[hits]))
+            if found and r < last_ring and sum(len(hits) for hits in found) >= k:
+                kth = np.partition(np.round(np.concatenate(distances), decimals), k - 1)[k - 1]
+                if self._lower_bound_km(lat, r) > kth + tolerance:
+                    break
+        positions, distances = np.concatenate(found), np.concatenate(distances)
+        order = np.lexsort((positions, np.round(distances, decimals)))[:k]
+        return positions[order], distances[order]
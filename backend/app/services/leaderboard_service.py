@@ -0,0 +1,149 @@
+# backend/app/services/leaderboard_service.py
+from typing import Dict, List, Optional
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session, aliased
+from ..models.gamification import GamificationProfile, profile_score, user_leaderboard_attributes
+from ..models.user import User
+from .blood_compatibility import normalize_blood_group
+from .point_award_queue import get_point_award_queue
+
+class LeaderboardService:
+    def __init__(self, session: Session = None):
+        self.session = session
+
+    @staticmethod
+    def calculate_score(profile: GamificationProfile) -> int:
+        """
+        Calculate a gamified score for a donor (see models.gamification.profile_score).
+        The same value is stored in GamificationProfile.score on every write.
+        """
+        return profile_score(profile)
+
+    @staticmethod
+    def _parse_cursor(cursor: str):
+        """"score:rank:position:user_id" -> (score, rank, position, user_id)"""
+        try:
+            score, rank, position, user_id = cursor.split(":", 3)
+            return int(score), int(rank), int(position), user_id
+        except ValueError:
+            raise ValueError(f"Invalid leaderboard cursor: {cursor!r}")
+
+    @staticmethod
+    def get_leaderboard_page(session: Session, top_n: int = 10, cursor: Optional[str] = None,
+                             region: Optional[str] = None, blood_group: Optional[str] = None) -> Dict:
+        """
+        One page of the points leaderboard: {"entries": [...], "next_cursor": str | None}.
+
+        Served by ORDER BY score DESC, user_id LIMIT top_n on the matching
+        composite index, starting after the cursor (keyset pagination). Ranks
+        are competition ranks ("1, 2, 2, 4") over the whole leaderboard: a
+        window RANK() over the page, offset by the position and last rank the
+        cursor carries from the previous page.
+        """
+        conditions = []
+        if region is not None:
+            conditions.append(GamificationProfile.region == region)
+        if blood_group is not None:
+            conditions.append(GamificationProfile.blood_group == normalize_blood_group(blood_group))
+        last_score = last_rank = None
+        position = 0
+        if cursor:
+            last_score, last_rank, position, last_user_id = LeaderboardService._parse_cursor(cursor)
+            conditions.append(or_(
+                GamificationProfile.score < last_score,
+                and_(GamificationProfile.score == last_score, GamificationProfile.user_id > last_user_id),
+            ))
+
+        page = (
+            select(GamificationProfile)
+            .where(*conditions)
+            .order_by(GamificationProfile.score.desc(), GamificationProfile.user_id)
+            .limit(top_n)
+            .subquery()
+        )
+        ranked = aliased(GamificationProfile, page)
+        page_rank = func.rank().over(order_by=ranked.score.desc())
+        rows = session.execute(
+            select(ranked, page_rank).order_by(ranked.score.desc(), ranked.user_id)
+        ).all()
+
+        entries = []
+        for profile, rank in rows:
+            # Ties with the previous page's last entry share its rank; everything
+            # lower comes after all `position` earlier entries
+            rank = last_rank if profile.score == last_score else position + rank
+            achievements = profile.achievements or {}
+            entries.append({
+                "user_id": profile.user_id,
+                "score": profile.score,
+                "donations": profile.donations_milestone,
+                "emergency_donations": achievements.get("emergency_donations", 0),
+                "current_streak": profile.current_streak,
+                "longest_streak": profile.longest_streak,
+                "badges": profile.badges,
+                "region": profile.region,
+                "blood_group": profile.blood_group,
+                "rank": rank,
+            })
+
+        next_cursor = None
+        if entries and len(entries) == top_n:
+            last = entries[-1]
+            next_cursor = f"{last['score']}:{last['rank']}:{position + len(entries)}:{last['user_id']}"
+        return {"entries": entries, "next_cursor": next_cursor}
+
+    @staticmethod
+    def get_points_leaderboard(session: Session, top_n: int = 10, region: Optional[str] = None,
+                               blood_group: Optional[str] = None) -> List[Dict]:
+        """
+        Returns the top N donors based on calculated gamified points
+        (optionally within one region or blood group).
+        """
+        return LeaderboardService.get_leaderboard_page(
+            session, top_n=top_n, region=region, blood_group=blood_group
+        )["entries"]
+
+    @staticmethod
+    def get_rank(session: Session, user_id: str) -> Optional[int]:
+        """Competition rank of one user on the global leaderboard, or None without a profile"""
+        score = session.execute(
+            select(GamificationProfile.score).where(GamificationProfile.user_id == user_id)
+        ).scalar()
+        if score is None:
+            return None
+        above = session.execute(
+            select(func.count()).select_from(GamificationProfile).where(GamificationProfile.score > score)
+        ).scalar()
+        return above + 1
+
+    @staticmethod
+    def sync_profile_attributes(session: Session) -> int:
+        """
+        Refresh the denormalized region / blood_group columns from users, for
+        writes that bypass the ORM (the CSV import). Returns the rows changed.
+        """
+        rows = session.execute(
+            select(GamificationProfile.user_id, GamificationProfile.region, GamificationProfile.blood_group,
+                   User.blood_group, User.latitude, User.longitude)
+            .join(User, User.user_id == GamificationProfile.user_id)
+        ).all()
+        changed = []
+        for user_id, region, blood_group, *user in rows:
+            attributes = user_leaderboard_attributes(*user)
+            if attributes != {"blood_group": blood_group, "region": region}:
+                changed.append({"user_id": user_id, **attributes})
+        for values in changed:
+            session.execute(
+                update(GamificationProfile)
+                .where(GamificationProfile.user_id == values.pop("user_id"))
+                .values(**values)
+            )
+        return len(changed)
+
+    def add_points(self, user_id: str, points: int):
+        """
+        Add points to a donor’s score. Awards go through the write-behind queue:
+        durable on return, applied to the profile (created if missing) within
+        POINT_AWARD_FLUSH_SECONDS, or immediately when POINT_AWARD_SYNCHRONOUS is set.
+        """
+        get_point_award_queue().award(user_id, points)
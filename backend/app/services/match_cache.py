@@ -0,0 +1,234 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.bridge_relationship import BridgeRelationship
+from ..models.user import User
+
+# Columns that feed the matcher's filters, score or response
+MATCH_FIELDS = (
+    "role", "blood_group", "latitude", "longitude", "eligibility_status", "next_eligible_date",
+    "last_donation_date", "donations_till_date", "calls_to_donations_ratio",
+    "user_donation_active_status", "status",
+)
+# Changes to these can't bring a donor into results it isn't already part of
+# (eligibility and active status only in the "worse" direction, see _drops_out_only)
+DROP_OUT_FIELDS = {"eligibility_status", "user_donation_active_status", "status", "last_donation_date"}
+
+# (patient_id, emergency, limit)
+MatchKey = Tuple[str, bool, int]
+
+
+@dataclass
+class _Entry:
+    value: Any
+    donor_ids: frozenset
+    expires_at: float
+
+
+class MatchResultCache:
+    """
+    TTL + LRU cache of donor match results.
+
+    Entries are keyed by (patient_id, emergency, limit, data version). Reverse
+    indexes from donor and patient ids to keys allow targeted invalidation.
+    Changes that could bring a donor into results it is not part of yet (a new
+    donor, a move, becoming eligible again) bump the data version instead, which
+    retires every entry at once.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        # Bumped by every invalidation; put() drops results computed across one
+        self.generation = 0
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._by_donor: Dict[str, Set[tuple]] = defaultdict(set)
+        self._by_patient: Dict[str, Set[tuple]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _key(self, key: MatchKey) -> tuple:
+        return key + (self.version,)
+
+    def get(self, key: MatchKey) -> Optional[Any]:
+        with self._lock:
+            full_key = self._key(key)
+            entry = self._entries.get(full_key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(full_key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(full_key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: MatchKey, value: Any, donor_ids: Iterable[str], generation: Optional[int] = None):
+        """
+        Store a result. Pass the generation read before computing it, so a result
+        computed while an invalidation ran is not stored.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            full_key = self._key(key)
+            if full_key in self._entries:
+                self._remove(full_key)
+            entry = _Entry(value, frozenset(donor_ids), time.monotonic() + self.ttl_seconds)
+            self._entries[full_key] = entry
+            self._by_patient[key[0]].add(full_key)
+            for donor_id in entry.donor_ids:
+                self._by_donor[donor_id].add(full_key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, full_key: tuple):
+        entry = self._entries.pop(full_key, None)
+        if entry is None:
+            return
+        for index, ids in ((self._by_patient, (full_key[0],)), (self._by_donor, entry.donor_ids)):
+            for id_ in ids:
+                keys = index.get(id_)
+                if keys is not None:
+                    keys.discard(full_key)
+                    if not keys:
+                        del index[id_]
+
+    def invalidate(self, donor_ids: Iterable[str] = (), patient_ids: Iterable[str] = ()) -> int:
+        """Drop entries containing any of the donors or belonging to any of the patients"""
+        with self._lock:
+            keys = set()
+            for donor_id in donor_ids:
+                keys |= self._by_donor.get(donor_id, set())
+            for patient_id in patient_ids:
+                keys |= self._by_patient.get(patient_id, set())
+            for full_key in keys:
+                self._remove(full_key)
+            self.generation += 1
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def bump_version(self):
+        """Retire every entry (the data changed in a way targeted invalidation can't cover)"""
+        with self._lock:
+            self.version += 1
+            self.generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._by_donor.clear()
+            self._by_patient.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+# Process-wide cache used by the /find-donors route
+match_cache = MatchResultCache(settings.MATCH_CACHE_MAX_ENTRIES, settings.MATCH_CACHE_TTL_SECONDS)
+
+
+# -----------------------------
+# Invalidation from ORM changes
+# -----------------------------
+@dataclass
+class _PendingInvalidation:
+    donors: Set[str] = field(default_factory=set)
+    patients: Set[str] = field(default_factory=set)
+    bump: bool = False
+
+
+def _changed_fields(user: User) -> Set[str]:
+    state = inspect(user)
+    return {name for name in MATCH_FIELDS if state.attrs[name].history.has_changes()}
+
+
+def _drops_out_only(user: User, changed: Set[str]) -> bool:
+    """True when the change can only lower the user's place in match results"""
+    if not changed <= DROP_OUT_FIELDS:
+        return False
+    if "eligibility_status" in changed and user.eligibility_status == "eligible":
+        return False
+    if "user_donation_active_status" in changed and user.user_donation_active_status != "inactive":
+        return False
+    return True
+
+
+def _pending(session: Session) -> _PendingInvalidation:
+    return session.info.setdefault("match_cache_pending", _PendingInvalidation())
+
+
+def invalidate_on_commit(session: Session):
+    """
+    Retire every cached result when session commits. For bulk Core statements
+    (the CSV import), which bypass the ORM events below.
+    """
+    _pending(session).bump = True
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_invalidations(session: Session, flush_context):
+    pending = _pending(session)
+    for obj in session.new:
+        if isinstance(obj, User):
+            pending.bump = True
+        elif isinstance(obj, BridgeRelationship):
+            pending.patients.add(obj.patient_id)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            pending.donors.add(obj.user_id)
+            pending.patients.add(obj.user_id)
+        elif isinstance(obj, BridgeRelationship):
+            pending.patients.add(obj.patient_id)
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            changed = _changed_fields(obj)
+            if changed:
+                pending.donors.add(obj.user_id)
+                pending.patients.add(obj.user_id)
+                pending.bump = pending.bump or not _drops_out_only(obj, changed)
+        elif isinstance(obj, BridgeRelationship):
+            pending.patients.add(obj.patient_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session: Session):
+    # Applied only once committed, so a concurrent request can't re-cache pre-commit data
+    pending = session.info.pop("match_cache_pending", None)
+    if pending is None:
+        return
+    if pending.bump:
+        match_cache.bump_version()
+    elif pending.donors or pending.patients:
+        match_cache.invalidate(pending.donors, pending.patients)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session: Session):
+    session.info.pop("match_cache_pending", None)
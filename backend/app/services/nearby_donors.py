@@ -0,0 +1,146 @@
+import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from .geo_index import GridIndex, haversine_km
+
+logger = logging.getLogger(__name__)
+
+# (blood group, latitude, longitude) of a profile
+LocationKey = Tuple[str, float, float]
+# (user_id, latitude, longitude, gender) of an eligible donor row
+DonorEntry = Tuple[str, float, float, object]
+
+
+class DonorPool:
+    """Eligible donors of one blood group with coordinates, in registry order, plus their grid"""
+
+    def __init__(self, group: str, donors: pd.DataFrame):
+        self.group = group
+        self.user_ids = donors["user_id"].tolist()
+        self.genders = ["Unknown" if pd.isna(g) else g for g in donors["gender"].tolist()]
+        self.latitudes = donors["latitude"].to_numpy(dtype=np.float64)
+        self.longitudes = donors["longitude"].to_numpy(dtype=np.float64)
+        self.entries: List[DonorEntry] = list(zip(self.user_ids, self.latitudes.tolist(),
+                                                  self.longitudes.tolist(), self.genders))
+        self.grid = GridIndex(self.latitudes, self.longitudes)
+
+
+class NearbyList(NamedTuple):
+    entries: Tuple[DonorEntry, ...]
+    donors: List[Dict]
+
+
+class NearbyDonorIndex:
+    """
+    Top-N nearby eligible donors for every profile location of one donor frame.
+
+    Lists are keyed by (blood group, lat, lon), so users at the same place share
+    one. A background warm-up computes every list; a miss before it finishes is
+    computed on the spot. When built from the previous frame's index, lists that
+    no donor change can affect are carried over instead of recomputed:
+    none of their donors left or changed, and no new or changed donor is closer
+    than their last entry.
+    """
+
+    def __init__(self, donors: pd.DataFrame, top_n: int = 5, previous: Optional["NearbyDonorIndex"] = None):
+        self.top_n = top_n
+        eligible = donors[
+            (donors["eligibility_status"].astype(str).str.lower() == "eligible") &
+            donors["blood_group"].notna() & donors["latitude"].notna() & donors["longitude"].notna()
+        ]
+        self.pools: Dict[str, DonorPool] = {
+            group: DonorPool(group, rows)
+            for group, rows in eligible.groupby("blood_group", observed=True, sort=False)
+        }
+
+        located = donors[donors["blood_group"].notna() & donors["latitude"].notna() & donors["longitude"].notna()]
+        self.keys: List[LocationKey] = list(dict.fromkeys(zip(
+            located["blood_group"].tolist(),
+            located["latitude"].astype(np.float64).tolist(),
+            located["longitude"].astype(np.float64).tolist(),
+        )))
+        self.key_set = set(self.keys)
+        self.lists: Dict[LocationKey, NearbyList] = {}
+        self.carried_over = 0
+        if previous is not None and previous.top_n == top_n:
+            self._carry_over(previous)
+
+    def _carry_over(self, previous: "NearbyDonorIndex"):
+        for group, pool in self.pools.items():
+            old = previous.pools.get(group)
+            if old is None:
+                continue
+            old_set, new_set = set(old.entries), set(pool.entries)
+            # Ties are broken by registry order, so surviving donors must keep their order
+            if [e for e in old.entries if e in new_set] != [e for e in pool.entries if e in old_set]:
+                continue
+            removed = old_set - new_set
+            added = [e for e in pool.entries if e not in old_set]
+            added_lats = np.array([e[1] for e in added], dtype=np.float64)
+            added_lons = np.array([e[2] for e in added], dtype=np.float64)
+            for key, nearby in list(previous.lists.items()):
+                if key[0] != group or key not in self.key_set:
+                    continue
+                if any(entry in removed for entry in nearby.entries):
+                    continue
+                if added:
+                    if len(nearby.donors) < self.top_n:
+                        continue
+                    closest = np.round(haversine_km(key[1], key[2], added_lats, added_lons), 2).min()
+                    if closest <= nearby.donors[-1]["distance_km"]:
+                        continue
+                self.lists[key] = nearby
+                self.carried_over += 1
+
+    def _compute(self, group: str, lat: float, lon: float, top_n: int) -> NearbyList:
+        pool = self.pools.get(group)
+        if pool is None:
+            return NearbyList((), [])
+        positions, distances = pool.grid.nearest(lat, lon, top_n)
+        return NearbyList(
+            tuple(pool.entries[i] for i in positions),
+            [
+                {
+                    "user_id": pool.user_ids[i],
+                    "blood_group": group,
+                    "distance_km": round(float(distance), 2),
+                    "gender": pool.genders[i],
+                }
+                for i, distance in zip(positions, distances)
+            ],
+        )
+
+    def for_location(self, group, lat, lon) -> List[Dict]:
+        """Precomputed list for a profile location (computed now if the warm-up hasn't reached it)"""
+        if pd.isna(group) or pd.isna(lat) or pd.isna(lon):
+            return []
+        key = (group, float(lat), float(lon))
+        nearby = self.lists.get(key)
+        if nearby is None:
+            nearby = self._compute(group, key[1], key[2], self.top_n)
+            if key in self.key_set:
+                self.lists[key] = nearby
+        return nearby.donors
+
+    def query(self, group: str, lat: float, lon: float, top_n: int) -> List[Dict]:
+        """Nearest eligible donors for an arbitrary point (not cached)"""
+        if top_n == self.top_n:
+            cached = self.lists.get((group, float(lat), float(lon)))
+            if cached is not None:
+                return cached.donors
+        return self._compute(group, float(lat), float(lon), top_n).donors
+
+    def warm(self):
+        """Compute every profile location's list"""
+        for key in self.keys:
+            if key not in self.lists:
+                self.lists[key] = self._compute(*key, self.top_n)
+        logger.info(f"Nearby donors: {len(self.lists)} locations ready ({self.carried_over} carried over)")
+
+    def warm_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.warm, name="nearby-donors-warmup", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,359 @@
+import fcntl
+import glob
+import json
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import bindparam, case, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.gamification import GamificationProfile, PointAwardJournal, PointAwardSeqBlock
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PendingAward:
+    points: int
+    seq: int  # highest award seq folded in
+
+
+class PointAwardQueue:
+    """
+    Write-behind queue for gamification point awards.
+
+    Awards are appended to a JSONL journal (fsynced) and coalesced per user in
+    memory; a background thread flushes them every flush_interval seconds, or
+    sooner once max_pending users are waiting, as one executemany UPDATE.
+
+    Each process has its own journal, "<name>.<id>.jsonl" next to journal_path,
+    registered in point_award_journals and held under an exclusive flock while
+    the process runs. Award seqs are taken from blocks reserved in the database,
+    so they are unique across processes. A flush applies every pending award
+    and records the highest seq it covered as the journal's applied_seq in the
+    same transaction, then rewrites the journal with the awards still pending.
+    start() replays the journals of processes that died (those whose flock it
+    can take), skipping awards at or below their applied_seq, so each award
+    reaches the database exactly once.
+
+    With synchronous=True each award is flushed before award() returns (tests).
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None,
+                 journal_path: Optional[str] = None, flush_interval: Optional[float] = None,
+                 max_pending: Optional[int] = None, synchronous: bool = False, fsync: Optional[bool] = None):
+        if session_factory is None:
+            from ..database import SessionLocal
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+        self.journal_path = journal_path
+        self.flush_interval = flush_interval if flush_interval is not None else settings.POINT_AWARD_FLUSH_SECONDS
+        self.max_pending = max_pending or settings.POINT_AWARD_MAX_PENDING
+        self.synchronous = synchronous
+        self.fsync = settings.POINT_AWARD_FSYNC if fsync is None else fsync
+
+        self._lock = threading.Lock()        # pending state + journal
+        self._flush_lock = threading.Lock()  # one flush at a time
+        self._pending: Dict[str, _PendingAward] = {}
+        self._journaled: List[Dict] = []     # journal records not flushed yet
+        self._journal = None
+        self._journal_id: Optional[int] = None
+        self._journal_file: Optional[str] = None
+        self._seq = 0
+        self._seq_end = 0  # last seq of the reserved block
+        self._started = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"awards": 0, "flushes": 0, "rows_updated": 0, "replayed": 0}
+
+    # -----------------------------
+    # Journal
+    # -----------------------------
+    def _journal_name(self, journal_id) -> str:
+        root, ext = os.path.splitext(self.journal_path)
+        return f"{root}.{journal_id}{ext or '.jsonl'}"
+
+    def _journal_files(self) -> Dict[int, str]:
+        """{journal id: path} of every process journal next to journal_path"""
+        root, ext = os.path.splitext(self.journal_path)
+        pattern = re.compile(re.escape(root) + r"\.(\d+)" + re.escape(ext or ".jsonl") + "$")
+        files = {}
+        for path in glob.glob(self._journal_name("*")):
+            match = pattern.match(path)
+            if match is not None:
+                files[int(match.group(1))] = path
+        return files
+
+    @staticmethod
+    def _read_journal(f) -> List[Dict]:
+        records = []
+        for line_no, line in enumerate(f, start=1):
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A torn final line from a crash mid-write; the award never returned
+                logger.warning(f"Point award journal: skipping unreadable line {line_no}")
+        return records
+
+    @staticmethod
+    def _open_locked(path: str, mode: str):
+        """Open path and take its exclusive flock, or None when another live process holds it"""
+        f = open(path, mode, encoding="utf-8")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+        return f
+
+    def _open_journal(self, session: Session):
+        """Register this process's journal and open it, locked, for appending"""
+        self._journal_id = session.execute(insert(PointAwardJournal).values(applied_seq=0)).inserted_primary_key[0]
+        session.commit()
+        self._journal_file = self._journal_name(self._journal_id)
+        # Locked under a name the orphan scan ignores, then renamed into place
+        tmp_path = f"{self._journal_file}.tmp"
+        self._journal = self._open_locked(tmp_path, "a")
+        os.replace(tmp_path, self._journal_file)
+
+    def _replay_orphans(self, session: Session) -> int:
+        """Apply the journals of dead processes, each under its flock; returns the awards applied"""
+        replayed = 0
+        for journal_id, path in self._journal_files().items():
+            if journal_id == self._journal_id:
+                continue
+            f = self._open_locked(path, "r")
+            if f is None:
+                continue  # its process is alive
+            try:
+                if not os.path.exists(path) or os.fstat(f.fileno()).st_ino != os.stat(path).st_ino:
+                    continue  # rewritten by its owner since we listed it, so the owner is alive
+                applied = session.scalar(
+                    select(PointAwardJournal.applied_seq).where(PointAwardJournal.id == journal_id)
+                ) or 0
+                batch: Dict[str, _PendingAward] = {}
+                records = [r for r in self._read_journal(f) if r["seq"] > applied]
+                for record in records:
+                    _fold(batch, record)
+                if batch:
+                    self._apply(session, batch, journal_id)
+                    session.commit()
+                # Only then the file, and the row last: a journal file always has its applied_seq
+                os.remove(path)
+                if os.path.exists(f"{path}.tmp"):
+                    os.remove(f"{path}.tmp")  # a rewrite the process died in; path is still complete
+                session.execute(delete(PointAwardJournal).where(PointAwardJournal.id == journal_id))
+                session.commit()
+                replayed += len(records)
+                if records:
+                    logger.info(f"Point awards: replayed {len(records)} awards from {path}")
+            finally:
+                f.close()
+        return replayed
+
+    def _append_journal(self, record: Dict):
+        if self._journal is None:
+            return
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def _rewrite_journal(self, records: List[Dict]):
+        if self._journal is None:
+            return
+        # The new file is locked before it replaces the old one, so it is never seen unlocked
+        tmp_path = f"{self._journal_file}.tmp"
+        f = self._open_locked(tmp_path, "w")
+        f.writelines(json.dumps(record) + "\n" for record in records)
+        f.flush()
+        os.fsync(f.fileno())
+        os.replace(tmp_path, self._journal_file)
+        self._journal.close()
+        self._journal = f
+
+    def _next_seq(self) -> int:
+        """Next award seq, reserving a new block from the database when this one is used up"""
+        if self._seq >= self._seq_end:
+            size = settings.POINT_AWARD_SEQ_BLOCK
+            with self.session_factory() as session:
+                block = session.execute(
+                    insert(PointAwardSeqBlock).values(journal_id=self._journal_id)
+                ).inserted_primary_key[0]
+                session.commit()
+            self._seq, self._seq_end = (block - 1) * size, block * size
+        self._seq += 1
+        return self._seq
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def start(self):
+        """Open this process's journal, replay those dead processes left behind, then start the flusher"""
+        with self._flush_lock, self._lock:
+            with self.session_factory() as session:
+                bind = session.get_bind()
+                for table in (PointAwardJournal.__table__, PointAwardSeqBlock.__table__):
+                    table.create(bind=bind, checkfirst=True)
+                if self.journal_path:
+                    self._open_journal(session)
+                    self.stats["replayed"] += self._replay_orphans(session)
+            self._started = True
+        if not self.synchronous:
+            self._thread = threading.Thread(target=self._run, name="point-award-flusher", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Stop the flusher and write everything still pending (called on shutdown)"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.flush()
+        finally:
+            # Anything not flushed stays in the journal for the next start() of any process
+            with self._lock:
+                self._started = False
+                if self._journal is not None:
+                    if not self._journaled:
+                        self._remove_journal()
+                    self._journal.close()
+                    self._journal = None
+
+    def _remove_journal(self):
+        os.remove(self._journal_file)
+        with self.session_factory() as session:
+            session.execute(delete(PointAwardJournal).where(PointAwardJournal.id == self._journal_id))
+            session.commit()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Point awards: flush failed, will retry: {e}")
+
+    # -----------------------------
+    # Awards
+    # -----------------------------
+    def award(self, user_id: str, points: int):
+        """Queue points for a user; durable once this returns"""
+        with self._lock:
+            if not self._started:
+                raise RuntimeError("PointAwardQueue.start() has not been called")
+            record = {"seq": self._next_seq(), "user_id": user_id, "points": points}
+            self._append_journal(record)
+            self._journaled.append(record)
+            _fold(self._pending, record)
+            self.stats["awards"] += 1
+            full = len(self._pending) >= self.max_pending
+        if self.synchronous:
+            self.flush()
+        elif full:
+            self._wake.set()
+
+    def pending(self) -> Dict[str, int]:
+        with self._lock:
+            return {user_id: award.points for user_id, award in self._pending.items()}
+
+    def flush(self) -> int:
+        """Apply all pending awards in one transaction; returns the users updated"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            try:
+                with self.session_factory() as session:
+                    self._apply(session, batch, self._journal_id)
+                    session.commit()
+            except Exception:
+                with self._lock:
+                    # Awards that arrived meanwhile are newer; fold the batch back under them
+                    for user_id, award in batch.items():
+                        _fold(self._pending, {"user_id": user_id, "points": award.points, "seq": award.seq})
+                raise
+
+            # The batch held every pending award, so all journal records up to its highest seq are applied
+            flushed_seq = max(award.seq for award in batch.values())
+            with self._lock:
+                self._journaled = [r for r in self._journaled if r["seq"] > flushed_seq]
+                self._rewrite_journal(self._journaled)
+                self.stats["flushes"] += 1
+                self.stats["rows_updated"] += len(batch)
+            return len(batch)
+
+    @staticmethod
+    def _apply(session: Session, batch: Dict[str, _PendingAward], journal_id: Optional[int] = None):
+        """Add the batch's points and, for a journal, record its highest seq as applied"""
+        user_ids = list(batch)
+        existing = set(session.scalars(
+            select(GamificationProfile.user_id).where(GamificationProfile.user_id.in_(user_ids))
+        ))
+        missing = [user_id for user_id in user_ids if user_id not in existing]
+        if missing:
+            session.add_all(GamificationProfile(user_id=user_id, total_points=0) for user_id in missing)
+            session.flush()
+
+        profiles = GamificationProfile.__table__
+        last_seq = func.coalesce(profiles.c.last_award_seq, 0)
+        session.execute(
+            profiles.update()
+            .where(profiles.c.user_id == bindparam("b_user_id"))
+            .values(total_points=func.coalesce(profiles.c.total_points, 0) + bindparam("b_points"),
+                    # Another process may have applied a higher seq already; never move it back
+                    last_award_seq=case((last_seq > bindparam("b_seq"), last_seq), else_=bindparam("b_seq"))),
+            [{"b_user_id": user_id, "b_points": award.points, "b_seq": award.seq} for user_id, award in batch.items()],
+        )
+        if journal_id is not None:
+            session.execute(
+                update(PointAwardJournal).where(PointAwardJournal.id == journal_id)
+                .values(applied_seq=max(award.seq for award in batch.values()))
+            )
+
+
+def _fold(pending: Dict[str, _PendingAward], record: Dict):
+    award = pending.get(record["user_id"])
+    if award is None:
+        pending[record["user_id"]] = _PendingAward(record["points"], record["seq"])
+    else:
+        award.points += record["points"]
+        award.seq = max(award.seq, record["seq"])
+
+
+# Process-wide queue, started on first use
+_queue: Optional[PointAwardQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_point_award_queue() -> PointAwardQueue:
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                synchronous = settings.POINT_AWARD_SYNCHRONOUS
+                queue = PointAwardQueue(
+                    journal_path=None if synchronous else settings.POINT_AWARD_JOURNAL_PATH,
+                    synchronous=synchronous,
+                )
+                queue.start()
+                _queue = queue
+    return _queue
+
+
+def shutdown_point_award_queue():
+    """Flush and stop the process-wide queue, if it was started"""
+    global _queue
+    with _queue_lock:
+        if _queue is not None:
+            _queue.close()
+            _queue = None
@@ -0,0 +1,120 @@
+import csv
+import io
+import os
+import re
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+from ..config import settings
+from .qr_cache import QRRender, qr_cache, render_qr_png
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable target for ZipFile; hands written bytes to the response as chunks"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def qr_filename(user_id: str) -> str:
+    """Archive-safe file name for a user's badge ("\\x27ab..." -> "27ab....png")"""
+    name = re.sub(r"[^A-Za-z0-9_-]", "", user_id[2:] if user_id.startswith("\\x") else user_id)
+    return f"{name or 'user'}.png"
+
+
+# Process-wide render pool, created on the first export and shut down with the app;
+# at most QR_BULK_MAX_EXPORTS exports share it at a time, the rest wait for a slot
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_export_slots = threading.BoundedSemaphore(settings.QR_BULK_MAX_EXPORTS)
+
+
+def pool_workers() -> int:
+    return max(min(settings.QR_BULK_WORKERS, os.cpu_count() or 1), 1)
+
+
+def get_qr_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=pool_workers())
+    return _pool
+
+
+def shutdown_qr_pool():
+    """Stop the render processes, if they were started"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def _rendered(items: List[Dict], params: Dict, pool: ProcessPoolExecutor) -> Iterator[tuple]:
+    """
+    Yield (item, png) in input order. Cache hits are served directly; misses are
+    rendered on the process pool with a bounded number in flight, so memory
+    stays flat however many codes are requested.
+    """
+    window = pool_workers() * 4
+    pending = deque()
+    try:
+        for item in items:
+            key = qr_cache.key(item["url"], **params)
+            cached = qr_cache.get(key)
+            pending.append((item, key, cached if cached is not None else pool.submit(render_qr_png, *key)))
+            while len(pending) >= window:
+                yield _resolve(pending.popleft())
+        while pending:
+            yield _resolve(pending.popleft())
+    finally:
+        # The client went away: don't leave its renders queued on the shared pool
+        for _, _, result in pending:
+            if not isinstance(result, QRRender):
+                result.cancel()
+
+
+def _resolve(entry) -> tuple:
+    item, key, result = entry
+    if isinstance(result, QRRender):
+        return item, result.png
+    return item, qr_cache.put(key, result.result()).png
+
+
+def stream_qr_zip(items: List[Dict], params: Dict) -> Iterator[bytes]:
+    """
+    Stream a ZIP of badge PNGs plus manifest.csv. items are {"user_id", "url"} dicts.
+    Each PNG is written and flushed to the client as soon as it is rendered.
+    """
+    sink = _ChunkSink()
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(["user_id", "file", "profile_url"])
+
+    with _export_slots:
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            for item, png in _rendered(items, params, get_qr_pool()):
+                filename = qr_filename(item["user_id"])
+                archive.writestr(filename, png)
+                writer.writerow([item["user_id"], filename, item["url"]])
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+            archive.writestr("manifest.csv", manifest.getvalue())
+        yield sink.drain()
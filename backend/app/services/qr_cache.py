@@ -0,0 +1,135 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from fastapi import Response
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+
+# (payload, version, box_size, border)
+RenderKey = Tuple[str, Optional[int], int, int]
+
+
+def render_qr_png(data: str, version: Optional[int] = None, box_size: int = 10, border: int = 4) -> bytes:
+    """Render a QR code to PNG bytes (module-level so it can also run in worker processes)"""
+    import qrcode
+
+    qr = qrcode.QRCode(version=version, box_size=box_size, border=border)
+    qr.add_data(data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def etag_for(key: RenderKey) -> str:
+    """
+    Strong ETag derived from the render inputs. Rendering is deterministic,
+    so it can be checked against If-None-Match without rendering anything.
+    """
+    digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for this header)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+@dataclass(frozen=True)
+class QRRender:
+    png: bytes
+    etag: str
+
+
+class QRRenderCache:
+    """LRU cache of rendered QR PNGs, bounded by total bytes rather than entry count"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[RenderKey, QRRender]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(data: str, version: Optional[int] = None, box_size: int = 10, border: int = 4) -> RenderKey:
+        return (data, version, box_size, border)
+
+    def get(self, key: RenderKey) -> Optional[QRRender]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: RenderKey, png: bytes) -> QRRender:
+        entry = QRRender(png, etag_for(key))
+        if len(png) > self.max_bytes:
+            return entry
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous.png)
+            self._entries[key] = entry
+            self._size += len(png)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.png)
+                self.evictions += 1
+        return entry
+
+    def render(self, data: str, **params) -> QRRender:
+        """Cached render; renders in the calling thread on a miss"""
+        key = self.key(data, **params)
+        return self.get(key) or self.put(key, render_qr_png(*key))
+
+    async def render_async(self, data: str, **params) -> QRRender:
+        """Cached render; a miss is rendered in the thread pool so the event loop keeps serving"""
+        key = self.key(data, **params)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        png = await run_in_threadpool(render_qr_png, *key)
+        return self.put(key, png)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=_cache_headers(etag))
+
+
+def png_response(render: QRRender) -> Response:
+    return Response(content=render.png, media_type="image/png", headers=_cache_headers(render.etag))
+
+
+def _cache_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": f"public, max-age={settings.QR_CACHE_MAX_AGE_SECONDS}"}
+
+
+# Process-wide cache shared by the QR endpoints
+qr_cache = QRRenderCache(settings.QR_CACHE_MAX_BYTES)
@@ -0,0 +1,133 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import and_, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.donor_booking import DonorBooking
+
+# pg_advisory_xact_lock key serializing book_many across workers
+BOOKING_LOCK_KEY = 0x7C41_0008
+
+
+class ScheduleLedger:
+    """
+    Persistent donor bookings shared by every worker through the database.
+    book_many holds a database-wide write lock while it checks each donor's
+    donation gap and inserts, so concurrent calls can't book a donor twice
+    within the gap; the (donor_id, scheduled_date) unique constraint backs
+    this up for same-day bookings.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        with self.session_factory() as db:
+            DonorBooking.__table__.create(bind=db.get_bind(), checkfirst=True)
+
+    def is_free(self, donor_id: str, day: date) -> bool:
+        """True when the donor has no booking on day"""
+        with self.session_factory() as db:
+            return db.query(DonorBooking.id).filter(
+                and_(DonorBooking.donor_id == donor_id, DonorBooking.scheduled_date == day)
+            ).first() is None
+
+    def booked_in_range(self, start: date, end: date) -> List[Dict]:
+        """Bookings with start <= scheduled_date < end, in date order"""
+        with self.session_factory() as db:
+            rows = db.query(DonorBooking).filter(
+                and_(DonorBooking.scheduled_date >= start, DonorBooking.scheduled_date < end)
+            ).order_by(DonorBooking.scheduled_date, DonorBooking.donor_id).all()
+            return [self._as_dict(row) for row in rows]
+
+    def bookings_by_donor(self, start: date, end: date) -> Dict[str, Set[date]]:
+        """{donor_id: booked days} for start <= scheduled_date < end"""
+        bookings = defaultdict(set)
+        with self.session_factory() as db:
+            rows = db.query(DonorBooking.donor_id, DonorBooking.scheduled_date).filter(
+                and_(DonorBooking.scheduled_date >= start, DonorBooking.scheduled_date < end)
+            )
+            for donor_id, day in rows:
+                bookings[donor_id].add(day)
+        return dict(bookings)
+
+    def book(self, donor_id: str, day: date, patient_id: str = None, transfusion_date: date = None) -> bool:
+        """Book the donor for day; False when another booking already holds that day"""
+        booked, _ = self.book_many([{
+            "donor_id": donor_id,
+            "scheduled_date": day.isoformat(),
+            "patient_id": patient_id,
+            "transfusion_date": transfusion_date.isoformat() if transfusion_date else None,
+        }])
+        return bool(booked)
+
+    def book_many(self, assignments: Iterable[Dict],
+                  gap_days: Optional[Dict[str, int]] = None) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Persist planner assignments one savepoint each, so a conflict only drops
+        that assignment. An assignment conflicts when its donor already has a
+        booking less than the donor's gap (gap_days, else DONATION_INTERVAL_DAYS)
+        away. Returns (booked, conflicts).
+        """
+        gap_days = gap_days or {}
+        booked, conflicts = [], []
+        with self.session_factory() as db:
+            self._lock_for_booking(db)
+            for assignment in assignments:
+                donor_id = assignment["donor_id"]
+                day = date.fromisoformat(assignment["scheduled_date"])
+                gap = timedelta(days=gap_days.get(donor_id, settings.DONATION_INTERVAL_DAYS))
+                transfusion_date = assignment.get("transfusion_date")
+                if self._has_booking_near(db, donor_id, day, gap):
+                    conflicts.append(assignment)
+                    continue
+                try:
+                    with db.begin_nested():
+                        db.add(DonorBooking(
+                            donor_id=donor_id,
+                            patient_id=assignment.get("patient_id"),
+                            scheduled_date=day,
+                            transfusion_date=date.fromisoformat(transfusion_date) if transfusion_date else None,
+                        ))
+                    booked.append(assignment)
+                except IntegrityError:
+                    conflicts.append(assignment)
+            db.commit()
+        return booked, conflicts
+
+    @staticmethod
+    def _lock_for_booking(db: Session):
+        """Take the booking write lock for this transaction, so check-then-insert is atomic"""
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            # Only one BEGIN IMMEDIATE transaction can be open at a time
+            db.execute(text("BEGIN IMMEDIATE"))
+        elif dialect == "postgresql":
+            db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": BOOKING_LOCK_KEY})
+
+    @staticmethod
+    def _has_booking_near(db: Session, donor_id: str, day: date, gap: timedelta) -> bool:
+        """True when the donor has a booking less than gap away from day"""
+        return db.query(DonorBooking.id).filter(
+            DonorBooking.donor_id == donor_id,
+            DonorBooking.scheduled_date > day - gap,
+            DonorBooking.scheduled_date < day + gap,
+        ).first() is not None
+
+    def expire_before(self, day: date) -> int:
+        """Delete bookings scheduled before day; returns the number removed"""
+        with self.session_factory() as db:
+            removed = db.query(DonorBooking).filter(DonorBooking.scheduled_date < day).delete(synchronize_session=False)
+            db.commit()
+            return removed
+
+    @staticmethod
+    def _as_dict(booking: DonorBooking) -> Dict:
+        return {
+            "donor_id": booking.donor_id,
+            "patient_id": booking.patient_id,
+            "scheduled_date": booking.scheduled_date.isoformat(),
+            "transfusion_date": booking.transfusion_date.isoformat() if booking.transfusion_date else None,
+        }
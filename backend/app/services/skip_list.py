@@ -0,0 +1,118 @@
+import random
+from typing import Any, Iterator, List, Optional, Tuple
+
+MAX_LEVEL = 32
+
+
+class _Node:
+    __slots__ = ("key", "value", "next", "width")
+
+    def __init__(self, key, value, level: int):
+        self.key = key
+        self.value = value
+        self.next: List[Optional["_Node"]] = [None] * level
+        # width[i]: level-0 steps from this node to next[i]
+        self.width: List[int] = [1] * level
+
+
+class IndexableSkipList:
+    """
+    Skip list of unique, ordered keys that also knows positions: insert, remove,
+    rank-of-key and item-at-position are O(log n); reading k consecutive items
+    from a position is O(log n + k).
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self._random = random.Random(seed)
+        self._tail = _Node(None, None, 0)
+        self._head = _Node(None, None, MAX_LEVEL)
+        self._head.next = [self._tail] * MAX_LEVEL
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _level(self) -> int:
+        level = 1
+        while level < MAX_LEVEL and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    def _predecessors(self, key) -> Tuple[List[_Node], List[int]]:
+        """Last node before key on every level, and the level-0 position of each"""
+        chain, positions = [self._head] * MAX_LEVEL, [0] * MAX_LEVEL
+        node, position = self._head, 0
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not self._tail and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level], positions[level] = node, position
+        return chain, positions
+
+    def insert(self, key, value: Any = None):
+        chain, positions = self._predecessors(key)
+        following = chain[0].next[0]
+        if following is not self._tail and following.key == key:
+            raise KeyError(f"Duplicate key {key!r}")
+        node = _Node(key, value, self._level())
+        position = positions[0] + 1
+        for level in range(MAX_LEVEL):
+            prev = chain[level]
+            if level < len(node.next):
+                node.next[level] = prev.next[level]
+                prev.next[level] = node
+                node.width[level] = prev.width[level] - (position - positions[level]) + 1
+                prev.width[level] = position - positions[level]
+            else:
+                prev.width[level] += 1
+        self._size += 1
+
+    def remove(self, key) -> Any:
+        chain, _ = self._predecessors(key)
+        node = chain[0].next[0]
+        if node is self._tail or node.key != key:
+            raise KeyError(key)
+        for level in range(MAX_LEVEL):
+            prev = chain[level]
+            if level < len(node.next):
+                prev.width[level] += node.width[level] - 1
+                prev.next[level] = node.next[level]
+            else:
+                prev.width[level] -= 1
+        self._size -= 1
+        return node.value
+
+    def rank(self, key) -> int:
+        """0-based position of key"""
+        node, position = self._head, 0
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not self._tail and node.next[level].key <= key:
+                position += node.width[level]
+                node = node.next[level]
+        if node is self._head or node.key != key:
+            raise KeyError(key)
+        return position - 1
+
+    def _node_at(self, index: int) -> _Node:
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        node, remaining = self._head, index + 1
+        for level in reversed(range(MAX_LEVEL)):
+            while node.width[level] <= remaining and node.next[level] is not self._tail:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+
+    def __getitem__(self, index: int) -> Tuple[Any, Any]:
+        node = self._node_at(index)
+        return node.key, node.value
+
+    def items(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[Any, Any]]:
+        """(key, value) pairs at positions start..stop-1, in key order"""
+        stop = self._size if stop is None else min(stop, self._size)
+        if start >= stop:
+            return
+        node = self._node_at(start)
+        for _ in range(stop - start):
+            yield node.key, node.value
+            node = node.next[0]
@@ -0,0 +1,227 @@
+import math
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+
+from ..config import settings
+from .blood_compatibility import COMPATIBLE, blood_group_code
+from .donor_scoring import score_donors
+from .geo_index import haversine_matrix_km
+
+# Cost of an infeasible (incompatible, too far, unavailable) donor/unit pair
+INFEASIBLE = 1e9
+EPOCH = date(1970, 1, 1)
+NEVER = np.iinfo(np.int64).max // 2
+
+DONOR_ROLES = ("Bridge Donor", "Emergency Donor")
+
+
+@dataclass
+class TransfusionSlot:
+    """One upcoming transfusion of a patient"""
+    patient_id: str
+    blood_group: str
+    latitude: float
+    longitude: float
+    transfusion_date: date
+    units: int = 1
+
+    @property
+    def scheduled_date(self) -> date:
+        """Donors are scheduled the day before the transfusion"""
+        return self.transfusion_date - timedelta(days=1)
+
+
+def _day(d: date) -> int:
+    return (d - EPOCH).days
+
+
+def _days(series: pd.Series) -> np.ndarray:
+    """Datetime column -> day numbers, NaT -> NEVER"""
+    values = series.to_numpy(dtype="datetime64[D]")
+    return np.where(np.isnat(values), NEVER, values.astype(np.int64))
+
+
+def patient_slots(patients: pd.DataFrame, start: date, horizon_days: int) -> List[TransfusionSlot]:
+    """
+    Expand each patient's expected_next_transfusion_date and frequency_in_days
+    into the transfusions falling in [start, start + horizon_days).
+    """
+    end = start + timedelta(days=horizon_days)
+    slots = []
+    columns = ["user_id", "blood_group", "latitude", "longitude",
+               "expected_next_transfusion_date", "frequency_in_days", "quantity_required"]
+    for patient_id, group, lat, lon, next_date, frequency, quantity in patients[columns].itertuples(index=False):
+        if pd.isna(next_date) or pd.isna(lat) or pd.isna(lon) or blood_group_code(group) < 0:
+            continue
+        current = next_date.date()
+        frequency = int(frequency) if pd.notna(frequency) and frequency > 0 else 0
+        if current < start:
+            if not frequency:
+                continue
+            current += timedelta(days=math.ceil((start - current).days / frequency) * frequency)
+        units = max(int(math.ceil(quantity)), 1) if pd.notna(quantity) else 1
+        while current < end:
+            slots.append(TransfusionSlot(patient_id, group, float(lat), float(lon), current, units))
+            if not frequency:
+                break
+            current += timedelta(days=frequency)
+    return slots
+
+
+class TransfusionPlanner:
+    """
+    Batch donor assignment for many patients' recurring transfusions.
+
+    Scheduling days are solved in date order. Each day is a min-cost bipartite
+    matching (scipy's linear_sum_assignment) between the units needed that day
+    and the donors free that day. The cost is the negated matching score, the
+    same one used by /find-donors: compatibility, distance and reliability.
+
+    Conflicts are tracked per donor as sorted booked days. Any booking blocks
+    the donor for its donation cycle on either side, so existing bookings
+    (e.g. from the schedule ledger) and new assignments share one check.
+    """
+
+    def __init__(self, donors: pd.DataFrame, bookings: Optional[Dict[str, Iterable[date]]] = None,
+                 max_distance_km: Optional[float] = None):
+        pool = donors[
+            donors["role"].isin(DONOR_ROLES) &
+            (donors["user_donation_active_status"].astype(str).str.lower() != "inactive") &
+            donors["latitude"].notna() & donors["longitude"].notna()
+        ]
+        self.max_distance_km = max_distance_km if max_distance_km is not None else settings.MAX_DISTANCE_KM
+        self.donor_ids = pool["user_id"].to_numpy()
+        self.donor_groups = pool["blood_group"].astype(object).to_numpy()
+        self.latitudes = pool["latitude"].to_numpy(dtype=np.float64)
+        self.longitudes = pool["longitude"].to_numpy(dtype=np.float64)
+        self.codes = np.array([blood_group_code(g) for g in self.donor_groups], dtype=np.int8)
+        self.donations = pool["donations_till_date"].to_numpy(dtype=np.float64)
+        self.calls_ratio = pool["calls_to_donations_ratio"].to_numpy(dtype=np.float64)
+
+        cycle = pool["cycle_of_donations"].to_numpy(dtype=np.float64)
+        self.gap_days = np.where(cycle > 0, cycle, settings.DONATION_INTERVAL_DAYS).astype(np.int64)
+
+        # First day each donor may donate: next_eligible_date, else now if eligible, else never
+        eligible_now = pool["eligibility_status"].astype(str).str.lower().to_numpy() == "eligible"
+        next_eligible = _days(pool["next_eligible_date"])
+        self.first_day = np.where(next_eligible != NEVER, next_eligible, np.where(eligible_now, 0, NEVER))
+
+        # Booked days per donor position (sorted); a booking blocks gap_days on either side
+        self.position = {donor_id: i for i, donor_id in enumerate(self.donor_ids)}
+        self.bookings: Dict[int, List[int]] = {}
+        self.add_bookings(bookings or {})
+
+    @property
+    def max_gap_days(self) -> int:
+        return int(self.gap_days.max()) if len(self.gap_days) else settings.DONATION_INTERVAL_DAYS
+
+    def gap_for(self, donor_id: str) -> int:
+        """Days a booking blocks this donor on either side"""
+        donor = self.position.get(donor_id)
+        return int(self.gap_days[donor]) if donor is not None else settings.DONATION_INTERVAL_DAYS
+
+    def add_bookings(self, bookings: Dict[str, Iterable[date]]):
+        """Register existing bookings ({donor_id: days}) as conflicts"""
+        for donor_id, days in bookings.items():
+            donor = self.position.get(donor_id)
+            if donor is not None:
+                for d in days:
+                    self._book(donor, _day(d))
+
+    def _book(self, donor: int, day: int):
+        days = self.bookings.setdefault(donor, [])
+        i = bisect_left(days, day)
+        if i == len(days) or days[i] != day:
+            days.insert(i, day)
+
+    def _blocked(self, day: int) -> List[int]:
+        """Donors with a booking less than their donation gap away from day"""
+        blocked = []
+        for donor, days in self.bookings.items():
+            gap = self.gap_days[donor]
+            i = bisect_left(days, day - gap + 1)
+            if i < len(days) and days[i] < day + gap:
+                blocked.append(donor)
+        return blocked
+
+    def plan(self, slots: List[TransfusionSlot]) -> Tuple[List[Dict], List[Dict]]:
+        """Assign donors to every unit of every slot; returns (assignments, unfilled units)"""
+        by_day: Dict[date, List[TransfusionSlot]] = defaultdict(list)
+        for slot in slots:
+            by_day[slot.scheduled_date].append(slot)
+
+        assignments, unfilled = [], []
+        for scheduled_date in sorted(by_day):
+            day_assignments, day_unfilled = self._plan_day(scheduled_date, by_day[scheduled_date])
+            assignments.extend(day_assignments)
+            unfilled.extend(day_unfilled)
+        return assignments, unfilled
+
+    def _plan_day(self, scheduled_date: date, slots: List[TransfusionSlot]):
+        day = _day(scheduled_date)
+        units = [slot for slot in slots for _ in range(slot.units)]
+        free = (self.first_day <= day) & (self.codes >= 0)
+        free[self._blocked(day)] = False
+        candidates = np.flatnonzero(free)
+        if not len(candidates):
+            return [], [self.unfilled_entry(slot) for slot in units]
+
+        unit_codes = np.array([blood_group_code(slot.blood_group) for slot in units], dtype=np.int8)
+        distances = haversine_matrix_km(
+            [slot.latitude for slot in units], [slot.longitude for slot in units],
+            self.latitudes[candidates], self.longitudes[candidates]
+        )
+        feasible = COMPATIBLE[self.codes[candidates][None, :], unit_codes[:, None]] & (distances <= self.max_distance_km)
+
+        # Donors are free on this day, so availability is the same for all of them
+        cost = np.full(distances.shape, INFEASIBLE)
+        ones = np.ones(len(candidates), dtype=bool)
+        zeros = np.zeros(len(candidates))
+        for code in np.unique(unit_codes):
+            rows = np.flatnonzero(unit_codes == code)
+            scores = score_donors(
+                distance_km=distances[rows], eligible=ones, days_until_eligible=zeros,
+                donations=self.donations[candidates], calls_ratio=self.calls_ratio[candidates],
+                blood_group_code=self.codes[candidates], patient_code=int(code)
+            )
+            cost[rows] = np.where(feasible[rows], -scores, INFEASIBLE)
+
+        # Only donors usable by at least one unit enter the matching
+        usable = np.flatnonzero(feasible.any(axis=0))
+        assignments, filled = [], set()
+        if len(usable):
+            rows, cols = linear_sum_assignment(cost[:, usable])
+            for row, col in zip(rows, cols):
+                col = usable[col]
+                if cost[row, col] >= INFEASIBLE:
+                    continue
+                donor = candidates[col]
+                slot = units[row]
+                self._book(donor, day)
+                filled.add(row)
+                assignments.append({
+                    "patient_id": slot.patient_id,
+                    "donor_id": self.donor_ids[donor],
+                    "blood_group": self.donor_groups[donor],
+                    "distance_km": round(float(distances[row, col]), 2),
+                    "score": round(float(-cost[row, col]), 4),
+                    "transfusion_date": slot.transfusion_date.isoformat(),
+                    "scheduled_date": scheduled_date.isoformat(),
+                })
+        unfilled = [self.unfilled_entry(slot) for row, slot in enumerate(units) if row not in filled]
+        return assignments, unfilled
+
+    @staticmethod
+    def unfilled_entry(slot: TransfusionSlot) -> Dict:
+        return {
+            "patient_id": slot.patient_id,
+            "blood_group": slot.blood_group,
+            "transfusion_date": slot.transfusion_date.isoformat(),
+            "scheduled_date": slot.scheduled_date.isoformat(),
+        }
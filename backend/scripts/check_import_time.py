@@ -0,0 +1,69 @@
+# backend/scripts/check_import_time.py
+"""
+Measure how long `import app.main` takes in a fresh interpreter and fail when
+it exceeds settings.IMPORT_TIME_BUDGET_MS or pulls in a module that should
+only load on first use.
+
+Usage: python scripts/check_import_time.py [--budget-ms N] [--top N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from app.config import settings
+
+# Loaded lazily (lifespan warm-up or first request), never by importing the app
+LAZY_MODULES = ("pandas", "qrcode", "PIL")
+
+
+def measure_import(module: str = "app.main"):
+    """Return [(module, self_us, cumulative_us)] from `python -X importtime`"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    timings = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append((name.strip(), int(self_us), int(cumulative_us)))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=int, default=settings.IMPORT_TIME_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    timings = measure_import()
+    total_ms = next(cum for name, _, cum in timings if name == "app.main") / 1000
+    imported = {name for name, _, _ in timings}
+
+    print(f"import app.main: {total_ms:.0f} ms (budget {args.budget_ms} ms)")
+    print("Slowest modules (self time):")
+    for name, self_us, _ in sorted(timings, key=lambda t: t[1], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.0f} ms exceeds budget of {args.budget_ms} ms")
+    for module in LAZY_MODULES:
+        if module in imported:
+            failures.append(f"{module} is imported eagerly")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
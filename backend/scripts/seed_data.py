@@ -17,17 +17,20 @@ def init_database():
     Base.metadata.create_all(bind=engine)
     logger.info("Database tables created successfully")
 
-def seed_data():
-    """Seed database with CSV data"""
+def seed_data(delta: bool = False):
+    """Seed database with CSV data (delta: apply only rows changed since the last import)"""
     db = SessionLocal()
     try:
         logger.info("Starting data seeding process...")
         
         # Import data from CSV
-        stats = DataImportService.import_from_csv(db)
+        if delta:
+            stats = DataImportService.import_delta(db)
+        else:
+            stats = DataImportService.import_from_csv(db)
         
         logger.info("Data seeding completed successfully!")
-        logger.info(f"Statistics: {stats}")
+        logger.info(f"Statistics: {stats.as_dict()}")
         
     except Exception as e:
         logger.error(f"Error during data seeding: {e}")
@@ -38,4 +41,4 @@ def seed_data():
 
 if __name__ == "__main__":
     init_database()
-    seed_data()
\ No newline at end of file
+    seed_data(delta="--delta" in sys.argv)
\ No newline at end of file
@@ -0,0 +1,66 @@
+import random
+from collections import Counter
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import BloodGroup, User, UserRole
+from app.services.blood_matching_service import BloodMatchingService
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    rng = random.Random(7)
+    with sessionmaker(bind=engine)() as session:
+        for n in range(12):
+            session.add(User(user_id=f"p{n:02d}", role=UserRole.PATIENT, blood_group=BloodGroup.A_POSITIVE,
+                             latitude=17.3 + rng.uniform(0, 0.2), longitude=78.4 + rng.uniform(0, 0.2)))
+        for n in range(40):
+            session.add(User(user_id=f"d{n:02d}", role=UserRole.DONOR,
+                             blood_group=rng.choice([BloodGroup.A_POSITIVE, BloodGroup.O_POSITIVE]),
+                             latitude=17.3 + rng.uniform(0, 0.2), longitude=78.4 + rng.uniform(0, 0.2),
+                             eligibility_status=rng.choice(["eligible", "not eligible"]),
+                             donations_till_date=rng.randint(0, 12), calls_to_donations_ratio=1.0,
+                             user_donation_active_status="Active"))
+        session.commit()
+        yield session
+
+
+def _greedy(patient_ids, rankings, limit, max_patients_per_donor):
+    """Reference: walk every (patient, candidate) pair best score first, patients in request order on ties"""
+    pairs = sorted(
+        ((-match["score"], patient_ids.index(pid), rank, pid, match["donor"].user_id)
+         for pid, matches in rankings.items() for rank, match in enumerate(matches)),
+    )
+    load, assigned = Counter(), {pid: [] for pid in patient_ids}
+    for _, _, _, pid, donor_id in pairs:
+        if len(assigned[pid]) < limit and load[donor_id] < max_patients_per_donor:
+            load[donor_id] += 1
+            assigned[pid].append(donor_id)
+    return assigned
+
+
+@pytest.mark.parametrize("limit,max_patients_per_donor", [(3, 1), (5, 2), (2, 100)])
+def test_donor_load_limit_matches_a_full_greedy_assignment(db, limit, max_patients_per_donor):
+    patient_ids = [f"p{n:02d}" for n in range(12)]
+    full = BloodMatchingService.find_matching_donors_batch(db, patient_ids, limit=1000)
+    limited = BloodMatchingService.find_matching_donors_batch(
+        db, patient_ids, limit=limit, max_patients_per_donor=max_patients_per_donor
+    )
+
+    expected = _greedy(patient_ids, full, limit, max_patients_per_donor)
+    assert {pid: [m["donor"].user_id for m in matches] for pid, matches in limited.items()} == expected
+    load = Counter(m["donor"].user_id for matches in limited.values() for m in matches)
+    assert max(load.values()) <= max_patients_per_donor
+
+
+def test_without_a_load_limit_each_patient_gets_its_top_donors(db):
+    patient_ids = ["p00", "p01"]
+    full = BloodMatchingService.find_matching_donors_batch(db, patient_ids, limit=1000)
+    top = BloodMatchingService.find_matching_donors_batch(db, patient_ids, limit=4)
+    for pid in patient_ids:
+        assert [m["donor"].user_id for m in top[pid]] == [m["donor"].user_id for m in full[pid][:4]]
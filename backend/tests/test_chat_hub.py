@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from app.services.chat_hub import ChatHub, RedisBroker
+
+
+class FakePubSub:
+    """redis 4.6 PubSub semantics: listen() returns once the last channel is unsubscribed"""
+
+    def __init__(self):
+        self.channels = {}
+        self.pending_unsubscribe_channels = set()
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        channel = channel.encode()
+        self.queue.put_nowait(("subscribe", channel, None))
+        self.channels[channel] = None
+        self.pending_unsubscribe_channels.discard(channel)
+
+    async def unsubscribe(self, channel):
+        channel = channel.encode()
+        self.pending_unsubscribe_channels.add(channel)
+        self.queue.put_nowait(("unsubscribe", channel, None))
+
+    async def listen(self):
+        while self.channels:
+            kind, channel, data = await self.queue.get()
+            if kind == "unsubscribe" and channel in self.pending_unsubscribe_channels:
+                self.pending_unsubscribe_channels.discard(channel)
+                self.channels.pop(channel, None)
+            yield {"type": kind, "channel": channel, "data": data}
+
+    async def close(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self, pubsub: FakePubSub):
+        self.pubsub = pubsub
+        self.values = {}
+
+    async def set(self, key, value, nx=False):
+        if not (nx and key in self.values):
+            self.values[key] = int(value)
+
+    async def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+    async def publish(self, channel, data):
+        if channel.encode() in self.pubsub.channels:
+            self.pubsub.queue.put_nowait(("message", channel.encode(), data.encode()))
+
+    async def close(self):
+        pass
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+
+def _fake_broker(initial_seq=None):
+    broker = RedisBroker("redis://localhost:6379/0", initial_seq)
+    broker._pubsub = FakePubSub()
+    broker._redis = FakeRedis(broker._pubsub)
+    return broker
+
+
+async def _received(ws, count):
+    for _ in range(100):
+        if len(ws.sent) >= count:
+            return ws.sent
+        await asyncio.sleep(0)
+    return ws.sent
+
+
+@pytest.mark.asyncio
+async def test_redis_broker_delivers_after_last_room_empties():
+    hub = ChatHub(_fake_broker())
+    await hub.start()
+
+    first = FakeSocket()
+    await hub.leave(await hub.join("global", first))
+    # Let the reader consume the unsubscribe and return from listen()
+    await asyncio.sleep(0.01)
+    assert hub.broker._reader.done()
+
+    second = FakeSocket()
+    await hub.join("global", second)
+    await hub.publish("global", "hello")
+    assert await _received(second, 1) == ["Message: hello"]
+    assert first.sent == []
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_redis_seq_is_seeded_from_the_log():
+    async def last_seq(room):
+        return 41
+
+    broker = _fake_broker(last_seq)
+    assert await broker.next_seq("global") == 42
+    assert await broker.next_seq("global") == 43
+    # An existing counter is left alone
+    broker._redis.values["tcare:chat:seq:other"] = 7
+    assert await broker.next_seq("other") == 8
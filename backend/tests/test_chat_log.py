@@ -0,0 +1,91 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import ChatMessage
+from app.services.chat_log import ChatLog
+
+
+def _message(seq, room="global"):
+    return {"room": room, "seq": seq, "text": f"m{seq}", "sender": None,
+            "sent_at": datetime.now(timezone.utc).isoformat()}
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def _stored_seqs(session_factory):
+    with session_factory() as session:
+        return list(session.scalars(select(ChatMessage.seq).order_by(ChatMessage.seq)))
+
+
+@pytest.mark.asyncio
+async def test_flush_skips_a_seq_already_stored(session_factory):
+    log = ChatLog(session_factory, batch_size=10)
+    log.append(_message(1))
+    await log.flush()
+
+    for seq in (1, 2, 3, 4, 5):
+        log.append(_message(seq))
+    await log.flush()
+
+    assert _stored_seqs(session_factory) == [1, 2, 3, 4, 5]
+    assert log._pending == []
+
+
+@pytest.mark.asyncio
+async def test_pending_queue_is_capped(session_factory):
+    log = ChatLog(session_factory, batch_size=100, max_pending=3)
+    for seq in range(1, 6):
+        log.append(_message(seq))
+
+    assert [m["seq"] for m in log._pending] == [3, 4, 5]
+    assert log.dropped == 2
+
+
+async def _flush_while_appending(log, arriving):
+    """Flush seqs 1-5 while `arriving` are appended during the write"""
+    write = log._write
+    loop = asyncio.get_running_loop()
+
+    def slow_write(batch):
+        if batch[0]["seq"] == 1:
+            for seq in arriving:
+                loop.call_soon_threadsafe(log.append, _message(seq))
+            time.sleep(0.05)
+        write(batch)
+
+    log._write = slow_write
+    for seq in range(1, 6):
+        log.append(_message(seq))
+    await log.flush()
+    await asyncio.sleep(0.01)
+    await log.flush()
+
+
+@pytest.mark.asyncio
+async def test_messages_in_flight_do_not_count_against_the_cap(session_factory):
+    log = ChatLog(session_factory, batch_size=5, max_pending=10)
+    await _flush_while_appending(log, range(6, 13))
+
+    assert _stored_seqs(session_factory) == list(range(1, 13))
+    assert log.dropped == 0
+
+
+@pytest.mark.asyncio
+async def test_overflow_during_a_write_drops_the_oldest_waiting_messages(session_factory):
+    log = ChatLog(session_factory, batch_size=5, max_pending=5)
+    await _flush_while_appending(log, range(6, 13))
+
+    # 1-5 were in flight and are stored; 6 and 7 are the ones dropped
+    assert _stored_seqs(session_factory) == [1, 2, 3, 4, 5, 8, 9, 10, 11, 12]
+    assert log.dropped == 2
@@ -0,0 +1,66 @@
+import csv
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import Base
+from app.models import User
+from app.services.data_import_service import RECORD_COLUMNS, DataImportService
+
+DONOR = {"role": "Emergency Donor", "blood_group": "A Positive", "latitude": "17.39", "longitude": "78.46",
+         "registration_date": "2020-04-18 10:27:00.000", "last_donation_date": "2025-08-17"}
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=RECORD_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(settings, "DONOR_COLUMNAR_SNAPSHOT", False)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as session:
+        yield session
+
+
+def _user_ids(db):
+    return set(db.scalars(select(User.user_id)))
+
+
+def test_delta_keeps_users_whose_row_was_rejected(db, tmp_path):
+    path = str(tmp_path / "registry.csv")
+    rows = [dict(DONOR, user_id=f"\\x{n:02x}") for n in range(3)]
+    _write_csv(path, rows)
+    DataImportService.import_delta(db, path)
+    assert _user_ids(db) == {"\\x00", "\\x01", "\\x02"}
+
+    rows[1]["last_donation_date"] = "not-a-date"
+    _write_csv(path, rows)
+    changes = DataImportService.import_delta(db, path)
+
+    assert changes.deleted == []
+    assert changes.stats.rejected == {"invalid_date": 1}
+    assert _user_ids(db) == {"\\x00", "\\x01", "\\x02"}
+
+
+def test_delta_skips_deletes_when_a_rejected_row_has_no_id(db, tmp_path):
+    path = str(tmp_path / "registry.csv")
+    rows = [dict(DONOR, user_id=f"\\x{n:02x}") for n in range(3)]
+    _write_csv(path, rows)
+    DataImportService.import_delta(db, path)
+
+    rows[1]["user_id"] = "garbled"
+    _write_csv(path, rows)
+    changes = DataImportService.import_delta(db, path)
+    assert changes.deleted == []
+    assert db.scalar(select(func.count()).select_from(User)) == 3
+
+    del rows[1]
+    _write_csv(path, rows)
+    assert DataImportService.import_delta(db, path).deleted == ["\\x01"]
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from app.services.geo_index import GridIndex, haversine_km
+
+
+def _brute_force(lats, lons, lat, lon, k, decimals=2):
+    distances = haversine_km(lat, lon, lats, lons)
+    positions = np.arange(len(lats))
+    order = np.lexsort((positions, np.round(distances, decimals)))[:k]
+    return positions[order], distances[order]
+
+
+def _check(index, lats, lons, lat, lon, k):
+    positions, distances = index.nearest(lat, lon, k)
+    expected_positions, expected_distances = _brute_force(lats, lons, lat, lon, k)
+    np.testing.assert_array_equal(positions, expected_positions)
+    np.testing.assert_allclose(distances, expected_distances)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_nearest_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(20, 400))
+    lats = rng.uniform(12.0, 18.0, n)
+    lons = rng.uniform(74.0, 80.0, n)
+    index = GridIndex(lats, lons)
+    for _ in range(25):
+        lat, lon = rng.uniform(11.0, 19.0), rng.uniform(73.0, 81.0)
+        _check(index, lats, lons, lat, lon, int(rng.integers(1, 12)))
+
+
+def test_points_and_queries_on_cell_edges():
+    rng = np.random.default_rng(42)
+    cell = 0.1
+    # Points within a hair of the cell boundaries, on both sides
+    edges_lat = 17.0 + cell * rng.integers(0, 10, 300) + rng.choice([-1e-9, 0.0, 1e-9], 300)
+    edges_lon = 78.0 + cell * rng.integers(0, 10, 300) + rng.uniform(0, cell, 300)
+    lats = np.r_[edges_lat, rng.uniform(17.0, 18.0, 100)]
+    lons = np.r_[edges_lon, rng.uniform(78.0, 79.0, 100)]
+    index = GridIndex(lats, lons, cell_deg=cell)
+    for _ in range(50):
+        lat = 17.0 + cell * rng.integers(0, 10) + rng.choice([-1e-7, 0.0, 1e-7])
+        lon = 78.0 + cell * rng.integers(0, 10) + rng.choice([-1e-7, 0.0, 1e-7])
+        _check(index, lats, lons, lat, lon, int(rng.integers(1, 8)))
+
+
+def test_k_beyond_the_first_rings():
+    rng = np.random.default_rng(7)
+    # Sparse points on a fine grid: the nearest k lie many rings out
+    lats = rng.uniform(10.0, 20.0, 60)
+    lons = rng.uniform(70.0, 80.0, 60)
+    index = GridIndex(lats, lons, cell_deg=0.05)
+    for k in (5, 30, 60, 100):
+        _check(index, lats, lons, 15.0, 75.0, k)
+    # A query far outside the grid
+    _check(index, lats, lons, 30.0, 90.0, 10)
+    assert len(index.nearest(15.0, 75.0, 100)[0]) == 60
+
+
+def test_empty_index():
+    positions, distances = GridIndex([], []).nearest(15.0, 75.0, 3)
+    assert len(positions) == 0 and len(distances) == 0
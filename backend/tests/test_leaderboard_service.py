@@ -0,0 +1,100 @@
+import random
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import BloodGroup, GamificationProfile, User, UserRole
+from app.models.gamification import region_of
+from app.services.leaderboard_service import LeaderboardService
+
+LOCATIONS = [(17.4, 78.5), (12.9, 77.6)]
+GROUPS = [BloodGroup.A_POSITIVE, BloodGroup.O_NEGATIVE]
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    rng = random.Random(3)
+    with sessionmaker(bind=engine)() as session:
+        for n in range(30):
+            user_id = f"u{n:02d}"
+            lat, lon = rng.choice(LOCATIONS)
+            session.add(User(user_id=user_id, role=UserRole.DONOR, blood_group=rng.choice(GROUPS),
+                             latitude=lat, longitude=lon))
+            session.flush()
+            # Few distinct scores, so ties span page boundaries
+            session.add(GamificationProfile(user_id=user_id, donations_milestone=rng.randint(0, 3),
+                                            current_streak=rng.choice([0, 2])))
+        session.commit()
+        yield session
+
+
+def _competition_ranks(profiles):
+    """[(user_id, score, rank)] in leaderboard order, ranked "1, 2, 2, 4" """
+    ordered = sorted(profiles, key=lambda p: (-p.score, p.user_id))
+    ranked = []
+    for i, profile in enumerate(ordered):
+        rank = ranked[-1][2] if ranked and ranked[-1][1] == profile.score else i + 1
+        ranked.append((profile.user_id, profile.score, rank))
+    return ranked
+
+
+def _summary(entries):
+    return [(e["user_id"], e["score"], e["rank"]) for e in entries]
+
+
+def _pages(session, top_n, **filters):
+    entries, cursor = [], None
+    while True:
+        page = LeaderboardService.get_leaderboard_page(session, top_n=top_n, cursor=cursor, **filters)
+        entries.extend(page["entries"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return entries
+
+
+@pytest.mark.parametrize("top_n", [1, 2, 3, 7])
+def test_keyset_pages_concatenate_to_the_full_leaderboard(session, top_n):
+    full = LeaderboardService.get_points_leaderboard(session, top_n=1000)
+    profiles = session.scalars(select(GamificationProfile)).all()
+
+    assert _summary(full) == _competition_ranks(profiles)
+    assert _summary(_pages(session, top_n)) == _summary(full)
+
+
+def test_get_rank_matches_the_leaderboard(session):
+    for user_id, _, rank in _summary(LeaderboardService.get_points_leaderboard(session, top_n=1000)):
+        assert LeaderboardService.get_rank(session, user_id) == rank
+    assert LeaderboardService.get_rank(session, "nobody") is None
+
+
+def test_region_and_blood_group_filters(session):
+    profiles = session.scalars(select(GamificationProfile)).all()
+    region = region_of(*LOCATIONS[0])
+    in_region = [p for p in profiles if p.region == region]
+    assert 0 < len(in_region) < len(profiles)
+    assert _summary(_pages(session, 4, region=region)) == _competition_ranks(in_region)
+
+    in_group = [p for p in profiles if p.blood_group == "O-"]
+    assert 0 < len(in_group) < len(profiles)
+    assert _summary(_pages(session, 4, blood_group="O Negative")) == _competition_ranks(in_group)
+
+
+def test_orm_update_rematerializes_score(session):
+    profile = session.scalars(select(GamificationProfile).where(GamificationProfile.user_id == "u00")).one()
+    profile.donations_milestone = 50
+    profile.current_streak = 0
+    profile.longest_streak = 0
+    session.commit()
+
+    assert session.scalar(select(GamificationProfile.score).where(GamificationProfile.user_id == "u00")) == 500
+    top = LeaderboardService.get_points_leaderboard(session, top_n=1)[0]
+    assert (top["user_id"], top["rank"]) == ("u00", 1)
+
+
+def test_invalid_cursor_is_rejected(session):
+    with pytest.raises(ValueError):
+        LeaderboardService.get_leaderboard_page(session, cursor="not-a-cursor")
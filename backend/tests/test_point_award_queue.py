@@ -0,0 +1,145 @@
+import glob
+
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import Base
+from app.models import GamificationProfile
+from app.services.point_award_queue import PointAwardQueue
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'awards.db'}")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / "point_awards.jsonl")
+
+
+def _queue(session_factory, journal_path=None, **kwargs):
+    queue = PointAwardQueue(session_factory, journal_path=journal_path, flush_interval=3600, fsync=False, **kwargs)
+    queue.start()
+    return queue
+
+
+def _crash(queue):
+    """The process dies without flushing, and its journal's flock goes with it"""
+    queue._journal.close()
+    queue._journal = None
+    queue._pending.clear()
+
+
+def _totals(session_factory):
+    with session_factory() as session:
+        return dict(session.execute(select(GamificationProfile.user_id, GamificationProfile.total_points)).all())
+
+
+def test_replay_after_crash_applies_each_award_once(session_factory, journal_path):
+    queue = _queue(session_factory, journal_path)
+    queue.award("x", 7)
+    queue.award("y", 5)
+    queue.flush()
+    queue.award("x", 3)
+    _crash(queue)
+
+    restarted = _queue(session_factory, journal_path)
+    assert restarted.stats["replayed"] == 1
+    assert _totals(session_factory) == {"x": 10, "y": 5}
+    restarted.close()
+
+    again = _queue(session_factory, journal_path)
+    assert again.stats["replayed"] == 0
+    again.close()
+    assert _totals(session_factory) == {"x": 10, "y": 5}
+    assert glob.glob(journal_path.replace(".jsonl", ".*")) == []
+
+
+def test_replay_skips_awards_committed_before_the_journal_was_rewritten(session_factory, journal_path, monkeypatch):
+    queue = _queue(session_factory, journal_path)
+    queue.award("x", 7)
+    monkeypatch.setattr(queue, "_rewrite_journal", lambda records: None)
+    queue.flush()
+    _crash(queue)
+
+    restarted = _queue(session_factory, journal_path)
+    assert restarted.stats["replayed"] == 0
+    assert _totals(session_factory) == {"x": 7}
+    restarted.close()
+
+
+def test_workers_sharing_a_journal_path_keep_each_others_awards(session_factory, journal_path):
+    a = _queue(session_factory, journal_path)
+    b = _queue(session_factory, journal_path)
+    b.award("x", 7)
+    a.award("y", 5)
+    a.flush()
+    # a lower seq applied after a higher one must not lower the high-water mark
+    b.award("y", 1)
+    _crash(b)
+
+    c = _queue(session_factory, journal_path)
+    assert _totals(session_factory) == {"x": 7, "y": 6}
+    with session_factory() as session:
+        seqs = dict(session.execute(select(GamificationProfile.user_id, GamificationProfile.last_award_seq)).all())
+    # b reserved the first seq block, a the second
+    assert seqs["y"] > settings.POINT_AWARD_SEQ_BLOCK
+    a.close()
+    c.close()
+
+
+def test_failed_flush_keeps_the_batch_and_awards_made_meanwhile(session_factory, monkeypatch):
+    queue = _queue(session_factory)
+    queue.award("x", 2)
+    apply = PointAwardQueue._apply
+
+    def failing_apply(session, batch, journal_id=None):
+        queue.award("x", 3)
+        queue.award("z", 4)
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(PointAwardQueue, "_apply", staticmethod(failing_apply))
+    with pytest.raises(RuntimeError):
+        queue.flush()
+    assert queue.pending() == {"x": 5, "z": 4}
+
+    monkeypatch.setattr(PointAwardQueue, "_apply", staticmethod(apply))
+    assert queue.flush() == 2
+    assert _totals(session_factory) == {"x": 5, "z": 4}
+    queue.close()
+
+
+def test_awards_to_one_user_coalesce_into_one_update(session_factory):
+    queue = _queue(session_factory)
+    queue.award("x", 2)
+    queue.award("x", 3)
+
+    updates = []
+    engine = session_factory.kw["bind"]
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE gamification_profiles"):
+            updates.append(parameters)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        queue.flush()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert len(updates) == 1
+    assert _totals(session_factory) == {"x": 5}
+    queue.close()
+
+
+def test_synchronous_awards_are_applied_before_returning(session_factory):
+    queue = _queue(session_factory, synchronous=True)
+    queue.award("x", 4)
+    assert _totals(session_factory) == {"x": 4}
+    assert queue.pending() == {}
+    queue.close()
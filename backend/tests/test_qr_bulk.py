@@ -0,0 +1,36 @@
+import io
+import zipfile
+
+from app.services import qr_bulk
+
+PARAMS = {"version": 1, "box_size": 2, "border": 1}
+
+
+def _export(prefix, count):
+    items = [{"user_id": f"\\x{prefix}{n:02x}", "url": f"https://example.test/{prefix}/{n}"} for n in range(count)]
+    return zipfile.ZipFile(io.BytesIO(b"".join(qr_bulk.stream_qr_zip(items, PARAMS))))
+
+
+def test_exports_share_one_pool_until_shutdown():
+    try:
+        first = _export("aa", 3)
+        pool = qr_bulk._pool
+        second = _export("bb", 3)
+
+        assert pool is not None and qr_bulk._pool is pool
+        assert sorted(first.namelist()) == ["aa00.png", "aa01.png", "aa02.png", "manifest.csv"]
+        assert len(second.namelist()) == 4
+    finally:
+        qr_bulk.shutdown_qr_pool()
+    assert qr_bulk._pool is None
+
+
+def test_abandoned_export_releases_its_slot():
+    try:
+        for _ in range(qr_bulk.settings.QR_BULK_MAX_EXPORTS + 1):
+            stream = qr_bulk.stream_qr_zip([{"user_id": "\\xcc", "url": "https://example.test/cc"}], PARAMS)
+            next(stream)
+            stream.close()
+        assert len(_export("dd", 1).namelist()) == 2
+    finally:
+        qr_bulk.shutdown_qr_pool()
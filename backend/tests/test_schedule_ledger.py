@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.services.schedule_ledger import ScheduleLedger
+
+START = date(2026, 1, 1)
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ledger.db'}")
+    return ScheduleLedger(sessionmaker(bind=engine))
+
+
+def _assignment(donor_id, day, patient_id="p1"):
+    return {"donor_id": donor_id, "patient_id": patient_id, "scheduled_date": day.isoformat(),
+            "transfusion_date": (day + timedelta(days=1)).isoformat()}
+
+
+def test_booking_within_the_donation_gap_conflicts(ledger):
+    booked, _ = ledger.book_many([_assignment("d1", START + timedelta(days=9))], {"d1": 90})
+    assert len(booked) == 1
+
+    booked, conflicts = ledger.book_many([_assignment("d1", START + timedelta(days=12))], {"d1": 90})
+    assert booked == [] and len(conflicts) == 1
+
+    booked, _ = ledger.book_many([_assignment("d1", START + timedelta(days=99))], {"d1": 90})
+    assert len(booked) == 1
+
+
+def test_concurrent_calls_book_a_donor_once_per_gap(ledger):
+    def book(offset):
+        booked, _ = ledger.book_many([_assignment("d1", START + timedelta(days=offset))], {"d1": 90})
+        return len(booked)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(book, range(16)))
+
+    assert sum(results) == 1
+    days = ledger.bookings_by_donor(START, START + timedelta(days=30))["d1"]
+    assert len(days) == 1
@@ -0,0 +1,81 @@
+import bisect
+import random
+
+import pandas as pd
+import pytest
+
+from app.services import gamification_service
+from app.services.skip_list import IndexableSkipList
+
+
+@pytest.mark.parametrize("trial", range(30))
+def test_matches_a_sorted_list(trial):
+    rng = random.Random(trial)
+    skip_list, reference = IndexableSkipList(seed=trial), []
+    for _ in range(400):
+        key = rng.randrange(200)
+        if key in reference and rng.random() < 0.6:
+            assert skip_list.remove(key) == f"v{key}"
+            reference.remove(key)
+        elif key not in reference:
+            skip_list.insert(key, f"v{key}")
+            bisect.insort(reference, key)
+        else:
+            with pytest.raises(KeyError):
+                skip_list.insert(key)
+
+        assert len(skip_list) == len(reference)
+        if reference:
+            probe = rng.choice(reference)
+            assert skip_list.rank(probe) == reference.index(probe)
+            index = rng.randrange(len(reference))
+            assert skip_list[index] == (reference[index], f"v{reference[index]}")
+            start = rng.randrange(len(reference) + 2)
+            stop = start + rng.randrange(12)
+            assert [k for k, _ in skip_list.items(start, stop)] == reference[start:stop]
+
+    assert [k for k, _ in skip_list.items()] == reference
+    missing = next(k for k in range(201) if k not in reference)
+    with pytest.raises(KeyError):
+        skip_list.rank(missing)
+    with pytest.raises(KeyError):
+        skip_list.remove(missing)
+    with pytest.raises(IndexError):
+        skip_list[len(reference)]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    rng = random.Random(5)
+    n = 60
+    frame = pd.DataFrame({
+        "user_id": [f"u{i:02d}" for i in range(n)],
+        "role": ["Emergency Donor"] * n,
+        "blood_group": ["A+"] * n,
+        # Few distinct scores, so ties are common
+        "donations_till_date": [float(rng.randint(0, 4)) for _ in range(n)],
+        "calls_to_donations_ratio": [rng.choice([0.0, 0.5, None]) for _ in range(n)],
+    })
+    monkeypatch.setattr(gamification_service, "get_donor_frame", lambda: frame)
+    return gamification_service.GamificationService()
+
+
+def _full_sort(service):
+    """Users by score, ties in first-appearance order"""
+    first_seen = {user_id: i for i, user_id in enumerate(service.scores)}
+    return sorted(service.scores, key=lambda user_id: (-service.scores[user_id], first_seen[user_id]))
+
+
+def test_gamification_ranks_and_pages_agree_with_a_full_sort(service):
+    rng = random.Random(11)
+    for _ in range(200):
+        service.add_points(f"u{rng.randrange(60):02d}", rng.choice([5, 10, 20]))
+
+    ordered = _full_sort(service)
+    for position, user_id in enumerate(ordered, start=1):
+        assert service.get_rank(user_id) == position
+    for offset in (0, 7, 55, 60):
+        page = service.get_leaderboard(top_n=10, offset=offset)
+        assert [entry["user_id"] for entry in page] == ordered[offset:offset + 10]
+        assert [entry["score"] for entry in page] == [service.scores[u] for u in ordered[offset:offset + 10]]
+    assert service.get_rank("nobody") is None